@@ -9,23 +9,42 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from loguru import logger
 
-from .tools import run_python_tool, run_query_tool
-from .prompts import BASE_SYSTEM
+from .tools import run_python_tool_json, run_query_tool_json
+from .prompts import build_system
 
 load_dotenv()  # loads OPENAI_API_KEY
 
 # Initialize OpenAI client
 client = OpenAI()
+# Bound once; chat() calls this every iteration of the ReAct loop
+_CREATE = client.chat.completions.create
 
 TOOLS = [
     {
         "type": "function",
         "function": {
             "name": "run_query",
-            "description": "Execute a read-only SQL SELECT on the Pokémon database to retrieve data.",
+            "description": (
+                "Execute a read-only SQL SELECT on the Pokémon database to retrieve data. "
+                "Returns a list of row objects, or {column: [values...]} with shape='columns'. "
+                "Pass a list of SELECTs to run them together; the result is then a list with one such result per query."
+            ),
             "parameters": {
                 "type": "object",
-                "properties": {"sql": {"type": "string", "description": "SQL SELECT query to execute"}},
+                "properties": {
+                    "sql": {
+                        "anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}],
+                        "description": "SQL SELECT query to execute, or a list of them",
+                    },
+                    "shape": {
+                        "type": "string",
+                        "enum": ["rows", "columns"],
+                        "description": (
+                            "'rows' (default) returns a list of row objects; 'columns' returns "
+                            "{column: [values...]}, which is smaller and better for aggregates"
+                        ),
+                    },
+                },
                 "required": ["sql"],
             },
         },
@@ -44,7 +63,10 @@ TOOLS = [
     },
 ]
 
-TOOL_MAP = {"run_query": run_query_tool, "run_python": run_python_tool}
+TOOL_MAP = {"run_query": run_query_tool_json, "run_python": run_python_tool_json}
+
+# Number of most recent user turns re-sent to the LLM on each request
+MAX_RECENT_TURNS = 6
 
 
 def chat(messages: List[Dict[str, str]], max_iterations: int = 10) -> str:
@@ -53,7 +75,7 @@ def chat(messages: List[Dict[str, str]], max_iterations: int = 10) -> str:
     
     while iteration < max_iterations:
         try:
-            response = client.chat.completions.create(
+            response = _CREATE(
                 model="gpt-4o-mini",
                 messages=messages,
                 tools=TOOLS,
@@ -93,7 +115,8 @@ def chat(messages: List[Dict[str, str]], max_iterations: int = 10) -> str:
                             {
                                 "role": "tool",
                                 "tool_call_id": tool_call.id,
-                                "content": json.dumps(result, default=str),
+                                # run_python already returns JSON; don't encode it twice
+                                "content": result if isinstance(result, str) else json.dumps(result, default=str),
                             }
                         )
                     except Exception as e:
@@ -118,9 +141,25 @@ def chat(messages: List[Dict[str, str]], max_iterations: int = 10) -> str:
     return "I reached the maximum number of iterations. Please try rephrasing your question."
 
 
-def create_chat_session() -> List[Dict[str, str]]:
-    """Create a new chat session with the system prompt."""
-    return [{"role": "system", "content": BASE_SYSTEM}]
+def create_chat_session(*context: str) -> List[Dict[str, str]]:
+    """Create a new chat session with the system prompt, plus any per-session `context`."""
+    return [{"role": "system", "content": build_system(*context)}]
+
+
+def trim_history(messages: List[Dict[str, str]], max_turns: int = MAX_RECENT_TURNS) -> List[Dict[str, str]]:
+    """Keep the leading system prompt plus the last `max_turns` user turns.
+
+    The cut always lands on a user message so tool calls stay paired with their results.
+    """
+    user_turns = [i for i, message in enumerate(messages) if message.get("role") == "user"]
+    if len(user_turns) <= max_turns:
+        return list(messages)
+
+    prefix = 0
+    while prefix < len(messages) and messages[prefix].get("role") == "system":
+        prefix += 1
+    start = user_turns[-max_turns] if max_turns > 0 else len(messages)
+    return messages[:prefix] + messages[start:]
 
 
 def add_user_message(messages: List[Dict[str, str]], content: str) -> None:
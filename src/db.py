@@ -1,9 +1,18 @@
 """Thin DB wrapper with safe read-only `run_query`."""
 from __future__ import annotations
 
+import atexit
+import contextlib
+import functools
+import json
+import re
 import sqlite3
+import stat
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Iterator, List, Tuple
 import os
 
 from loguru import logger
@@ -13,25 +22,354 @@ if "STREAMLIT_ENV" in os.environ or os.environ.get("HOME") == "/home/adminuser":
 else:
     DB_PATH = Path(__file__).parent / "pokedex.db"
 
+# Leading SELECT keyword, matched without building a lowercased copy of the query.
+# Faster in CPython than folding the first six bytes into an int and comparing.
+_SELECT_RE = re.compile(r"\s*select\b", re.IGNORECASE)
 
-def run_query(sql: str, db_path: Path = DB_PATH) -> List[dict[str, Any]]:
-    """Execute a read-only SQL query on the Pokémon database."""
-    if not sql.strip().lower().startswith("select"):
+# Table references (FROM x / JOIN x), skipping schema-qualified names and table-valued functions.
+# `IS [NOT] DISTINCT FROM expr` is consumed with an empty group so its operand isn't taken for a table.
+_TABLE_REF_RE = re.compile(r"\bdistinct\s+from\b|\b(?:from|join)\s+(\w+)\b(?!\s*[.(])", re.IGNORECASE)
+# Quoted strings/identifiers and comments, blanked out before looking for table references
+_NOISE_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_WITH_RE = re.compile(r"\bwith\b", re.IGNORECASE)
+# Trailing semicolons, whitespace and comments, stripped before a query is wrapped in a subquery
+_TRAILER_RE = re.compile(r"(?:\s|;|--[^\n]*|/\*.*?\*/)*\Z", re.DOTALL)
+# SQL whose result changes between runs on the same file; never served from the result cache
+_VOLATILE_RE = re.compile(r"\brandom(?:blob)?\s*\(|'now'|\bcurrent_(?:date|time|timestamp)\b", re.IGNORECASE)
+_BUILTIN_TABLES = frozenset({"sqlite_master", "sqlite_schema", "sqlite_temp_master", "sqlite_temp_schema"})
+
+# Upper bound on the read-only memory map; the Pokédex database is far smaller
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Queries the agent and CLI issue constantly; prepared once when a connection opens
+_WARM_STATEMENTS = (
+    "SELECT 1",
+    "SELECT id, name FROM pokemon_species LIMIT 2",
+    "SELECT name FROM pokemon_species WHERE id=1",
+)
+
+# Runaway queries (accidental cross joins, unbounded recursive CTEs) are interrupted
+# once they exceed PROGRESS_INTERVAL * MAX_PROGRESS_CALLS VM instructions (~500M)
+PROGRESS_INTERVAL = 100_000
+MAX_PROGRESS_CALLS = 5_000
+
+# One connection per (thread, database); dropped with the thread's locals when it exits
+_local = threading.local()
+
+# LRU of query results keyed on (sql, db path, db mtime). The database is read-only
+# at runtime, and an ETL rebuild changes the mtime, so entries never go stale.
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_MAX_ROWS = 5_000
+_result_cache: OrderedDict[tuple, Tuple[tuple, tuple]] = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _on_progress() -> bool:
+    """SQLite progress handler; a true return interrupts the running statement."""
+    _local.progress_calls += 1
+    return _local.progress_calls > MAX_PROGRESS_CALLS
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    """Return this thread's cached connection to `db_path`, opening it on first use.
+
+    Each call starts a fresh instruction budget for the statement about to run.
+    """
+    _local.progress_calls = 0
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+
+    key = str(db_path)
+    conn = pool.get(key)
+    if conn is None:
+        # Read-only at the SQLite level too, so a query that slips past the SELECT
+        # check still cannot write. Not immutable=1: ETL rebuilds the file in place.
+        # The agent re-issues a small set of queries, so keep more of them prepared.
+        # Autocommit: a rejected write must not leave an implicit transaction open
+        # that would break run_queries' explicit BEGIN.
+        conn = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            cached_statements=512,
+            isolation_level=None,
+        )
+        conn.execute("PRAGMA query_only = 1")
+        # Serve page reads from a shared memory map instead of read() calls per page
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        # 64 MiB page cache (negative = KiB) and in-memory temp b-trees for sorts/GROUP BY
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.set_progress_handler(_on_progress, PROGRESS_INTERVAL)
+        for stmt in _WARM_STATEMENTS:
+            try:
+                conn.execute(stmt).close()
+            except sqlite3.Error:
+                pass  # e.g. a database without the Pokédex tables
+        pool[key] = conn
+    return conn
+
+
+def close_connections() -> None:
+    """Close the calling thread's cached connections."""
+    pool = getattr(_local, "connections", None) or {}
+    for conn in pool.values():
+        conn.close()
+    pool.clear()
+
+
+atexit.register(close_connections)
+
+
+@functools.lru_cache(maxsize=16)
+def _known_tables(db_key: str, mtime_ns: int) -> frozenset[str]:
+    """Lower-cased names usable as tables in the database at `db_key` as of `mtime_ns`.
+
+    Covers tables, views and eponymous virtual tables such as dbstat; the
+    pragma_* tables aren't listed anywhere, so `_check_tables` skips those.
+    """
+    conn = _connect(Path(db_key))
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+    try:
+        names += [row[0] for row in conn.execute("SELECT name FROM pragma_module_list")]
+    except sqlite3.Error:
+        pass  # Built without introspection pragmas; virtual tables just fail the pre-check
+    return frozenset(name.lower() for name in names) | _BUILTIN_TABLES
+
+
+def _check_tables(sql: str, db_key: str, mtime_ns: int) -> None:
+    """Fail fast on references to missing tables, without preparing the statement."""
+    sql = _NOISE_RE.sub("''", sql)
+    if _WITH_RE.search(sql):
+        return  # CTE names aren't in sqlite_master; let SQLite resolve them
+    known = _known_tables(db_key, mtime_ns)
+    for name in _TABLE_REF_RE.findall(sql):
+        if name and name.lower() not in known and not name.lower().startswith("pragma_"):
+            raise sqlite3.OperationalError(f"no such table: {name}")
+
+
+def _columns(cursor: sqlite3.Cursor) -> Tuple[str, ...]:
+    """`cursor`'s column names, interned.
+
+    Row dicts from every query then share one copy of each key, and lookups
+    with a literal key (`row["name"]`) match on identity.
+    """
+    return tuple(sys.intern(d[0]) for d in cursor.description)
+
+
+def _fetch(sql: str, db_path: Path, mtime_ns: int) -> Tuple[tuple, tuple]:
+    """Run `sql` and return (column names, rows), serving repeats from the result cache.
+
+    Queries using random() or the current date/time always run.
+    """
+    key = (sql.strip(), str(db_path), mtime_ns)
+    cacheable = not _VOLATILE_RE.search(sql)
+    if cacheable:
+        with _result_cache_lock:
+            cached = _result_cache.get(key)
+            if cached is not None:
+                _result_cache.move_to_end(key)
+                return cached
+
+    _check_tables(sql, key[1], key[2])
+    cursor = _connect(db_path).execute(sql)
+    # Read column names once per statement rather than per row via sqlite3.Row
+    result = (_columns(cursor), tuple(cursor.fetchall()))
+    if cacheable and len(result[1]) <= RESULT_CACHE_MAX_ROWS:
+        with _result_cache_lock:
+            _result_cache[key] = result
+            if len(_result_cache) > RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+    return result
+
+
+def _db_mtime(db_path: Path) -> int | None:
+    """mtime_ns of the database file, or None if `db_path` is not a regular file."""
+    try:
+        st = db_path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns if stat.S_ISREG(st.st_mode) else None
+
+
+def _validate(sql: str, db_path: Path) -> int:
+    """Reject non-SELECT statements and missing databases; return the database mtime_ns.
+
+    The one stat() both checks the file and versions the caches, so a query
+    costs a single syscall before SQLite is involved.
+    """
+    if not _SELECT_RE.match(sql):
         raise ValueError("Only SELECT statements are permitted")
-    
-    if not db_path.exists():
+
+    mtime_ns = _db_mtime(db_path)
+    if mtime_ns is None:
         raise FileNotFoundError(f"Database not found at {db_path}. Run ETL first.")
-    
+    return mtime_ns
+
+
+def _fetch_rows(sql: str, db_path: Path, mtime_ns: int) -> List[sqlite3.Row]:
+    """Run `sql` uncached, returning sqlite3.Row objects that share one description."""
+    _check_tables(sql, str(db_path), mtime_ns)
+    cursor = _connect(db_path).cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(sql).fetchall()
+
+
+def run_query(
+    sql: str, db_path: Path = DB_PATH, as_dict: bool = True
+) -> List[dict[str, Any]] | List[sqlite3.Row]:
+    """Execute a read-only SQL query on the Pokémon database.
+
+    With `as_dict=False` rows come back as `sqlite3.Row` (key and index access,
+    much smaller than a dict per row) and bypass the result cache; use it for
+    large scans that are only iterated.
+    """
+    mtime_ns = _validate(sql, db_path)
+
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        rows = conn.execute(sql).fetchall()
-        conn.close()
-        logger.debug("SQL query returned: %d rows", len(rows))
-        return [dict(r) for r in rows]
+        if not as_dict:
+            rows = _fetch_rows(sql, db_path, mtime_ns)
+            logger.debug("SQL query returned: {} rows", len(rows))
+            return rows
+        columns, rows = _fetch(sql, db_path, mtime_ns)
+        logger.debug("SQL query returned: {} rows", len(rows))
+        # Fresh dicts each call so callers can't mutate cached results
+        return [dict(zip(columns, row)) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"SQL error: {e}")
+        raise ValueError(f"SQL execution failed: {e}")
+
+
+def _columnar(columns: Tuple[str, ...], rows: Any) -> dict[str, list]:
+    """Transpose `rows` into one list per column; columns survive an empty result."""
+    values = zip(*rows) if rows else [()] * len(columns)
+    return {column: list(v) for column, v in zip(columns, values)}
+
+
+def run_query_columns(sql: str, db_path: Path = DB_PATH) -> dict[str, list]:
+    """Like `run_query`, but return `{column: [values...]}` instead of a dict per row.
+
+    Much smaller for long results, and aggregates (`sum(result["hp"])`) run
+    straight over a list. Repeated column names keep the last column's values.
+    """
+    mtime_ns = _validate(sql, db_path)
+
+    try:
+        columns, rows = _fetch(sql, db_path, mtime_ns)
+    except sqlite3.Error as e:
+        logger.error(f"SQL error: {e}")
+        raise ValueError(f"SQL execution failed: {e}")
+    logger.debug("SQL query returned: {} rows", len(rows))
+    return _columnar(columns, rows)
+
+
+def run_queries(
+    sqls: List[str], db_path: Path = DB_PATH, columnar: bool = False
+) -> List[List[dict[str, Any]]] | List[dict[str, list]]:
+    """Run several SELECTs in one read transaction, so they all see the same snapshot.
+
+    Every statement is validated before any runs; execution stops at the first
+    failing one. Like `as_dict=False`, this bypasses the result cache. With
+    `columnar=True` each result is shaped as in `run_query_columns`.
+    """
+    mtime_ns = None
+    for sql in sqls:
+        mtime_ns = _validate(sql, db_path)
+    if mtime_ns is None:
+        return []
+
+    conn = _connect(db_path)
+    results = []
+    try:
+        conn.execute("BEGIN")
+        for sql in sqls:
+            # Each statement gets its own runaway-query budget
+            _local.progress_calls = 0
+            _check_tables(sql, str(db_path), mtime_ns)
+            cursor = conn.execute(sql)
+            columns = _columns(cursor)
+            if columnar:
+                results.append(_columnar(columns, cursor.fetchall()))
+            else:
+                results.append([dict(zip(columns, row)) for row in cursor])
+    except sqlite3.Error as e:
+        logger.error(f"SQL error: {e}")
+        raise ValueError(f"SQL execution failed on statement {len(results) + 1}: {e}")
+    finally:
+        conn.commit()
+    logger.debug("SQL batch ran {} statements", len(results))
+    return results
+
+
+def _iter_rows(cursor: sqlite3.Cursor) -> Iterator[dict[str, Any]]:
+    """Yield `cursor`'s rows as dicts, closing it when exhausted or abandoned."""
+    with contextlib.closing(cursor):
+        columns = _columns(cursor)
+        try:
+            for row in cursor:
+                yield dict(zip(columns, row))
+        except sqlite3.Error as e:
+            logger.error(f"SQL error: {e}")
+            raise ValueError(f"SQL execution failed: {e}")
+
+
+def run_query_iter(sql: str, db_path: Path = DB_PATH) -> Iterator[dict[str, Any]]:
+    """Like `run_query`, but yield rows lazily and bypass the result cache.
+
+    Rows are only fetched as the caller consumes them; closing the generator
+    early releases the cursor. Validation errors are raised immediately.
+    """
+    mtime_ns = _validate(sql, db_path)
+
+    try:
+        _check_tables(sql, str(db_path), mtime_ns)
+        cursor = _connect(db_path).execute(sql)
     except sqlite3.Error as e:
         logger.error(f"SQL error: {e}")
         raise ValueError(f"SQL execution failed: {e}")
+    return _iter_rows(cursor)
+
+
+def _quote(name: str, quote: str) -> str:
+    """Quote `name` as an SQL string literal (') or identifier (")."""
+    return quote + name.replace(quote, quote * 2) + quote
+
+
+def _strip_trailer(sql: str) -> str:
+    """`sql` without trailing semicolons and comments, so it can be wrapped in a subquery."""
+    # Blank string literals (same length) so a "--" or ";" inside one isn't taken for a trailer
+    masked = _NOISE_RE.sub(lambda m: m.group() if m.group()[0] in "-/" else "x" * len(m.group()), sql)
+    return sql[:_TRAILER_RE.search(masked).start()].strip()
+
+
+def run_query_json(sql: str, db_path: Path = DB_PATH) -> bytes:
+    """Like `run_query`, but return the rows as a JSON array of objects built by SQLite.
+
+    Skips the per-row dicts and the Python JSON encoder, as well as the result
+    cache and the missing-table pre-check. REALs come out with SQLite's 15
+    significant digits, and repeated column names get SQLite's "name:1"
+    suffixes instead of overwriting each other. Results holding BLOBs, which
+    JSON can't represent, go through `run_query` instead.
+    """
+    _validate(sql, db_path)
+    # Newline before ")" as a guard against anything the trailer strip missed
+    inner = _strip_trailer(sql)
+    try:
+        conn = _connect(db_path)
+        probe = conn.execute(f"SELECT * FROM ({inner}\n) LIMIT 0")
+        columns = [d[0] for d in probe.description]
+        probe.close()
+        pairs = ", ".join(_quote(c, "'") + ", " + _quote(c, '"') for c in columns)
+        row = conn.execute(
+            f"SELECT json_group_array(json_object({pairs})) FROM ({inner}\n)"
+        ).fetchone()
+        return row[0].encode()
+    except sqlite3.Error as e:
+        if "BLOB" not in str(e):
+            logger.error(f"SQL error: {e}")
+            raise ValueError(f"SQL execution failed: {e}")
+
+    return json.dumps(run_query(sql, db_path), default=str).encode()
 
 
 def get_table_info(table_name: str, db_path: Path = DB_PATH) -> List[dict[str, Any]]:
@@ -39,13 +377,18 @@ def get_table_info(table_name: str, db_path: Path = DB_PATH) -> List[dict[str, A
     return run_query(f"PRAGMA table_info({table_name})", db_path)
 
 
+@functools.lru_cache(maxsize=16)
+def _list_tables_cached(db_key: str, mtime_ns: int) -> tuple[str, ...]:
+    """Table names in the database at `db_key` as of `mtime_ns`."""
+    cursor = _connect(Path(db_key)).execute("SELECT name FROM sqlite_master WHERE type='table'")
+    return tuple(row[0] for row in cursor.fetchall())
+
+
 def list_tables(db_path: Path = DB_PATH) -> List[str]:
     """List all tables in the database."""
-    if not db_path.exists():
+    # A plain stat is far cheaper than letting sqlite3 fail to open the file
+    mtime_ns = _db_mtime(db_path)
+    if mtime_ns is None:
         return []
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return tables 
\ No newline at end of file
+
+    return list(_list_tables_cached(str(db_path), mtime_ns))
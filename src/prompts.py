@@ -1,4 +1,6 @@
 """System prompts and templates for the Pokédex agent."""
+import re
+from types import MappingProxyType
 
 BASE_SYSTEM = """You are Pokédex-Pro, an advanced Pokémon research assistant with comprehensive knowledge of all Pokémon data.
 
@@ -73,7 +75,6 @@ POKÉMON CLASSIFICATION:
 - gender: id, name
 - pokemon_color: id, name
 - pokemon_shape: id, name
-- pokemon_form: id, name, order_, form_order, is_default, is_battle_only, is_mega, form_name, pokemon, version_group
 
 NATURES AND TRAINING:
 - nature: id, name, decreased_stat, increased_stat, hates_flavor, likes_flavor
@@ -108,7 +109,7 @@ IMPORTANT RELATIONSHIPS:
 WORKFLOW:
 1. Analyze the user's question to understand what data is needed
 2. Write appropriate SQL queries to gather the required information
-3. Call run_query() with your SQL
+3. Call run_query() with your SQL; pass several SELECTs as a list to run them together. For aggregate analysis, prefer shape='columns', which returns {column: [values...]}
 4. Analyze the results and iterate if needed
 5. Use run_python() for complex calculations, team analysis, or data processing
 6. Provide a clear, concise answer with explanations
@@ -137,7 +138,30 @@ COMPREHENSIVE CAPABILITIES:
 
 Always think step-by-step and provide helpful explanations. If you use SQL queries, include them in ```sql``` blocks for transparency. You now have access to the most comprehensive Pokémon database available!"""
 
-FEW_SHOT_EXAMPLES = [
+
+def _compact(text: str) -> str:
+    """Strip trailing spaces and blank lines; section headers already delimit the prompt."""
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    return re.sub(r"\n{2,}", "\n", text).strip()
+
+
+# Every uncached request pays for these tokens, so send the compact form.
+# Nothing here varies per request, so it stays a byte-identical, cacheable prefix.
+BASE_SYSTEM_STATIC = _compact(BASE_SYSTEM)
+BASE_SYSTEM = BASE_SYSTEM_STATIC
+
+
+def build_system(*dynamic: str) -> str:
+    """System prompt with per-request context appended after the static prefix.
+
+    Provider prompt caches match on the longest identical prefix, so anything
+    that changes between requests must come after BASE_SYSTEM_STATIC.
+    """
+    extra = "\n".join(_compact(part) for part in dynamic if part)
+    return f"{BASE_SYSTEM_STATIC}\n{extra}" if extra else BASE_SYSTEM_STATIC
+
+
+_FEW_SHOT_EXAMPLES = [
     {
         "user": "What's the best team of 6 Pokémon for competitive battling?",
         "assistant": "I'll help you build a competitive team! Let me analyze the strongest Pokémon and their type coverage.\n\n```sql\nSELECT p.name, ps.is_legendary, ps.is_mythical, ps.capture_rate\nFROM pokemon p\nJOIN pokemon_species ps ON p.species_id = ps.id\nWHERE ps.is_legendary = 1 OR ps.is_mythical = 1\nORDER BY ps.capture_rate ASC\nLIMIT 20;\n```"
@@ -174,4 +198,7 @@ FEW_SHOT_EXAMPLES = [
         "user": "Which Pokémon can learn Thunderbolt?",
         "assistant": "Let me find all Pokémon that can learn Thunderbolt.\n\n```sql\nSELECT DISTINCT p.name, pm.learn_method, pm.level_learned_at, pm.version_group\nFROM pokemon p\nJOIN pokemon_moves pm ON p.id = pm.pokemon_id\nWHERE pm.move_name = 'thunderbolt'\nORDER BY p.name, pm.level_learned_at;\n```"
     }
-] 
\ No newline at end of file
+]
+
+# Shared by every caller; read-only so one test or request can't edit another's examples
+FEW_SHOT_EXAMPLES = tuple(MappingProxyType(example) for example in _FEW_SHOT_EXAMPLES)
@@ -1,85 +1,234 @@
 """Tool functions exposed to the LLM."""
 from __future__ import annotations
 
+import ast
+import builtins
+import collections
+import functools
+import itertools
 import json
+import math
+import re
+import statistics
 import textwrap
+import types
 from typing import Any, Dict, List
 
-from .db import run_query
+import orjson
 
+from .db import run_queries, run_query, run_query_columns, run_query_json
 
-def run_query_tool(sql: str) -> List[Dict[str, Any]]:
-    """JSON-serialisable wrapper used in the OpenAI function call."""
+# Caps on what run_python_tool_json hands back to the LLM
+MAX_RESULT_CHARS = 32_000
+MAX_LIST_ITEMS = 50
+# What code that defines no public variables returns, without a serialiser call
+_EMPTY_RESULT = "{}"
+
+# Names sandboxed code may not call or reference, compared case-insensitively
+BLOCKED_CALLS = frozenset({
+    "open", "file", "__import__", "eval", "exec", "compile", "globals", "locals",
+    "getattr", "setattr", "delattr", "hasattr", "vars", "input",
+})
+BLOCKED_MODULES = frozenset({"os", "subprocess", "sys"})
+# Attributes sandboxed code may not read, compared case-insensitively: blocked names
+# reached through another object, modules that lead back to os/sys/open, and the
+# frame attributes that lead to the host's globals
+BLOCKED_ATTRS = BLOCKED_CALLS | BLOCKED_MODULES | frozenset({
+    "codecs", "random", "builtins",
+    "gi_frame", "cr_frame", "ag_frame", "tb_frame", "f_back", "f_globals", "f_locals", "f_builtins",
+})
+
+# Substrings refused in code that doesn't parse, matched case-insensitively
+DANGEROUS_PATTERNS = (
+    "open(", "file(", "__import__(", "eval(", "exec(", "compile(",
+    "os.", "subprocess.", "sys.", "import ", "from ", "globals(", "locals(",
+    "getattr(", "setattr(", "delattr(", "hasattr(", "vars(", "input(",
+)
+# One alternation scans the code once instead of once per pattern
+_DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS_PATTERNS)), re.IGNORECASE)
+
+
+# Result shapes run_query_tool can return: a dict per row, or a list per column
+QUERY_SHAPES = ("rows", "columns")
+
+
+def run_query_tool(
+    sql: str | List[str], shape: str = "rows"
+) -> List[Dict[str, Any]] | Dict[str, list] | List[Any]:
+    """JSON-serialisable wrapper used in the OpenAI function call.
+
+    A list of statements runs as one batch and returns one result per statement.
+    `shape="columns"` returns `{column: [values...]}` for each result instead.
+    """
     try:
-        return run_query(sql)
+        if shape not in QUERY_SHAPES:
+            raise ValueError(f"Unknown shape {shape!r}; expected one of {QUERY_SHAPES}")
+        columnar = shape == "columns"
+        if not isinstance(sql, str):
+            return run_queries(sql, columnar=columnar)
+        return run_query_columns(sql) if columnar else run_query(sql)
     except Exception as e:
         return [{"error": str(e)}]
 
 
-def run_python_tool(code: str, _globals: dict | None = None) -> str:
-    """Execute sandboxed Python code for advanced reasoning."""
+def run_query_tool_json(sql: str | List[str], shape: str = "rows") -> str:
+    """`run_query_tool` as JSON text, built by SQLite for a single query in rows shape.
+
+    This is what the agent calls.
+    """
+    if isinstance(sql, str) and shape == "rows":
+        try:
+            return run_query_json(sql).decode()
+        except Exception as e:
+            return _dumps([{"error": str(e)}])
+    return orjson.dumps(run_query_tool(sql, shape), default=str).decode()
+
+
+def _prune(value: Any) -> Any:
+    """Shorten long sequences so a single variable can't flood the tool response."""
+    if isinstance(value, dict):
+        return {k: _prune(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_prune(v) for v in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"... {len(value) - MAX_LIST_ITEMS} more items ({len(value)} total)")
+        return items
+    return value
+
+
+def _dumps(result: Dict[str, Any]) -> str:
+    """Serialise a result dict to compact JSON, capped at MAX_RESULT_CHARS."""
+    try:
+        payload = orjson.dumps(result, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        # orjson rejects e.g. integers wider than 64 bits
+        payload = json.dumps(result, default=str, separators=(",", ":"))
+    cut = MAX_RESULT_CHARS
+    while len(payload) > MAX_RESULT_CHARS:
+        wrapped = orjson.dumps({"_truncated": True, "output": payload[:cut]}).decode()
+        if len(wrapped) <= MAX_RESULT_CHARS:
+            return wrapped
+        # Re-encoding escapes quotes and backslashes (up to double length), so
+        # shrink the cut in proportion to the overshoot rather than by it
+        cut = cut * MAX_RESULT_CHARS // len(wrapped)
+    return payload
+
+
+# Builtins available to sandboxed code, read-only so calls can share one mapping
+SAFE_BUILTINS = types.MappingProxyType({name: getattr(builtins, name) for name in (
+    "len", "sorted", "sum", "min", "max", "round", "abs",
+    "list", "dict", "set", "tuple", "str", "int", "float", "bool",
+    "enumerate", "zip", "range", "filter", "map", "any", "all", "reversed",
+)})
+
+def _public_namespace(module: types.ModuleType) -> types.ModuleType:
+    """A copy of `module` holding only its public, non-module attributes.
+
+    Sandboxed code then can't walk from e.g. `statistics` to `statistics.sys`.
+    """
+    namespace = types.ModuleType(module.__name__, module.__doc__)
+    namespace.__dict__.update(
+        (name, value) for name, value in vars(module).items()
+        if not name.startswith("_") and not isinstance(value, types.ModuleType)
+    )
+    return namespace
+
+
+# Modules preloaded into every sandbox; never reported back as variables
+SANDBOX_MODULES = types.MappingProxyType({
+    module.__name__: _public_namespace(module)
+    for module in (json, math, statistics, collections, itertools)
+})
+
+
+class _SandboxChecker(ast.NodeVisitor):
+    """Reject imports, blocked builtins/modules/attributes and private access in sandboxed code."""
+
+    def visit_Import(self, node: ast.Import) -> None:
+        raise SecurityError("Operation not allowed: import ")
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        raise SecurityError("Operation not allowed: from ")
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name) and node.func.id.lower() in BLOCKED_CALLS:
+            raise SecurityError(f"Operation not allowed: {node.func.id.lower()}(")
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if node.attr.startswith("_") or node.attr.lower() in BLOCKED_ATTRS:
+            raise SecurityError(f"Operation not allowed: .{node.attr}")
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        name = node.id.lower()
+        if name in BLOCKED_MODULES:
+            raise SecurityError(f"Operation not allowed: {name}.")
+        if name.startswith("__") and name.endswith("__"):
+            raise SecurityError(f"Operation not allowed: {node.id}")
+
+
+@functools.lru_cache(maxsize=256)
+def _parse(source: str) -> ast.Module:
+    """Parse sandbox source; the agent and tests re-send identical snippets."""
+    return ast.parse(source, mode="exec")
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(source: str) -> types.CodeType:
+    """Compile already-checked sandbox source; compiling dominates for short snippets."""
+    return compile(_parse(source), "<sandbox>", "exec")
+
+
+def _check_code(source: str) -> ast.Module | None:
+    """Raise SecurityError for disallowed code; return its AST, or None if it doesn't parse.
+
+    Unparseable code can't be walked, so it gets the plain substring scan instead.
+    """
+    try:
+        tree = _parse(source)
+    except SyntaxError:
+        match = _DANGEROUS_RE.search(source)
+        if match:
+            raise SecurityError(f"Operation not allowed: {match.group().lower()}")
+        return None
+    _SandboxChecker().visit(tree)
+    return tree
+
+
+def run_python_tool(code: str, _globals: dict | None = None) -> Dict[str, Any]:
+    """Execute sandboxed Python code for advanced reasoning and return its public variables."""
     _globals = _globals or {}
     
     # Check for dangerous operations before execution
-    dangerous_patterns = [
-        "open(", "file(", "__import__(", "eval(", "exec(", "compile(",
-        "os.", "subprocess.", "sys.", "import ", "from ", "globals(", "locals(",
-        "getattr(", "setattr(", "delattr(", "hasattr("
-    ]
-    
-    code_lower = code.lower()
-    for pattern in dangerous_patterns:
-        if pattern in code_lower:
-            raise SecurityError(f"Operation not allowed: {pattern}")
+    source = textwrap.dedent(code)
+    tree = _check_code(source)
     
-    # Safe builtins for data processing
-    safe_builtins = {
-        "len": len, 
-        "sorted": sorted, 
-        "sum": sum, 
-        "min": min, 
-        "max": max,
-        "round": round,
-        "abs": abs,
-        "list": list,
-        "dict": dict,
-        "set": set,
-        "tuple": tuple,
-        "str": str,
-        "int": int,
-        "float": float,
-        "bool": bool,
-        "enumerate": enumerate,
-        "zip": zip,
-        "range": range,
-        "filter": filter,
-        "map": map,
-        "any": any,
-        "all": all,
-        "reversed": reversed,
-    }
-    
-    # Create a safe execution environment
-    safe_globals = {
-        "__builtins__": safe_builtins,
-        "json": json,
-        "math": __import__("math"),
-        "statistics": __import__("statistics"),
-        "collections": __import__("collections"),
-        "itertools": __import__("itertools"),
-    }
+    # Fresh globals per call; the shared pieces are built once at import
+    safe_globals = {"__builtins__": SAFE_BUILTINS, **SANDBOX_MODULES}
     safe_globals.update(_globals)
     
     try:
         # Execute the code in the safe environment
-        exec(textwrap.dedent(code), safe_globals)
+        exec(_compile(source) if tree is not None else source, safe_globals)
         
-        # Return non-private variables as JSON
-        result = {k: v for k, v in safe_globals.items() 
-                 if not k.startswith("_") and k not in ["json", "math", "statistics", "collections", "itertools"]}
-        return json.dumps(result, default=str)
+        # Return non-private variables
+        return {k: v for k, v in safe_globals.items()
+                if not k.startswith("_") and k not in SANDBOX_MODULES and not isinstance(v, types.ModuleType)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def run_python_tool_json(code: str) -> str:
+    """`run_python_tool` pruned and serialised for the LLM; this is what the agent calls."""
+    result = run_python_tool(code)
+    if not result:
+        return _EMPTY_RESULT
+    try:
+        return _dumps(_prune(result))
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        # Valid Python that JSON can't hold, e.g. tuple dict keys
+        return _dumps({"error": str(e)})
 
 
 class SecurityError(Exception):
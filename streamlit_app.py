@@ -7,7 +7,7 @@ from pathlib import Path
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.agent import chat, create_chat_session, add_user_message, add_assistant_message
+from src.agent import chat, create_chat_session, add_user_message, add_assistant_message, trim_history
 from src.db import DB_PATH
 from src.etl import load_all
 
@@ -137,7 +137,11 @@ def main():
         # Get response
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                response = chat(st.session_state.messages)
+                # Only send a bounded window; keep the tool messages chat() appends
+                history = trim_history(st.session_state.messages)
+                sent = len(history)
+                response = chat(history)
+                st.session_state.messages.extend(history[sent:])
             st.write(response)
         
         # Add assistant response
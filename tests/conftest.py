@@ -1,15 +1,33 @@
+import os
 import sys
+import types
 from pathlib import Path
+from unittest.mock import Mock
 sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Stub the OpenAI SDK before src.agent is imported so unit tests never build a real
+# HTTP client. Set POKEDEX_REAL_OPENAI=1 to run against the real package.
+if not os.environ.get("POKEDEX_REAL_OPENAI"):
+    _fake_openai = types.ModuleType("openai")
+    _fake_openai.OpenAI = lambda **_: Mock()
+    sys.modules["openai"] = _fake_openai
+
 import pytest
+import src.agent, src.cli, src.etl, src.prompts, src.tools  # warm: pay import cost once, during collection
 from src import db
-from unittest.mock import Mock
 import contextlib
+import functools
+import json
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 @pytest.fixture(scope="session")
 def mini_db(tmp_path_factory):
-    """Create a minimal test database without running ETL."""
+    """Create a minimal test database without running ETL.
+
+    Built once per session and shared by every test, so treat it as read-only;
+    tests that need a raw connection should use `mini_db_ro`.
+    """
     path: Path = tmp_path_factory.mktemp("data") / "mini.db"
     
     # Create a minimal database with just the schema
@@ -43,11 +61,65 @@ def mini_db(tmp_path_factory):
     conn.close()
     return path
 
+@pytest.fixture
+def mini_db_ro(mini_db):
+    """A read-only connection to `mini_db` that skips file locking."""
+    conn = sqlite3.connect(f"{mini_db.as_uri()}?mode=ro&immutable=1", uri=True)
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope="session")
+def thread_pool():
+    """Long-lived worker threads shared by concurrency tests, like a deployed app's pool."""
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        yield pool
+
+@pytest.fixture(scope="session")
+def base_session():
+    """A chat session built once; tests that mutate it should take a copy."""
+    from src import agent
+    return agent.create_chat_session()
+
 @pytest.fixture(autouse=True)
 def _patch_db(monkeypatch, mini_db):
     """Force src.db to use the test database."""
     monkeypatch.setattr(db, "DB_PATH", mini_db)
 
+@pytest.fixture(scope="session", autouse=True)
+def _warm_db(mini_db):
+    """Open the main thread's pooled connection to mini_db before the first test runs."""
+    db.run_query("SELECT 1", mini_db)
+
+# Scripted tool arguments repeat verbatim (e.g. `[call] * 15`); parse each string once.
+# The agent only **-unpacks the result, so sharing the parsed dict is safe.
+_cached_json = types.SimpleNamespace(loads=functools.lru_cache(maxsize=None)(json.loads), dumps=json.dumps)
+
+def _wrap_response(response_data):
+    """Build a namespace matching the OpenAI response structure, or the error building it raised."""
+    try:
+        # Handle different response types
+        if "tool_calls" in response_data:
+            # Tool call response
+            tool_calls = [
+                types.SimpleNamespace(
+                    id=tool_call_data.get("id", "call_123"),
+                    function=types.SimpleNamespace(
+                        name=tool_call_data["function"]["name"],
+                        arguments=tool_call_data["function"]["arguments"],
+                    ),
+                )
+                for tool_call_data in response_data["tool_calls"]
+            ]
+        else:
+            # Regular response
+            tool_calls = None
+    except (KeyError, TypeError) as e:
+        # Malformed scripted responses surface as an API error when they are served
+        return e
+    
+    message = types.SimpleNamespace(tool_calls=tool_calls, content=response_data.get("content", ""))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
 @pytest.fixture
 def scripted_llm(monkeypatch):
     """
@@ -55,37 +127,25 @@ def scripted_llm(monkeypatch):
         with scripted_llm([msg1, msg2, ...]):
             ...call agent.chat()...
     """
+    script = []
+
+    def fake_create(*_, **__):
+        response = script.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    # Patch the agent's bound create() once; entering the factory only swaps the script
+    monkeypatch.setattr("src.agent._CREATE", fake_create)
+    monkeypatch.setattr("src.agent.json", _cached_json)
+
     @contextlib.contextmanager
     def factory(sequence):
-        def fake_create(*_, **__):
-            response_data = sequence.pop(0)
-            
-            # Create a mock response that matches the OpenAI API structure
-            mock_response = Mock()
-            mock_choice = Mock()
-            mock_message = Mock()
-            
-            # Handle different response types
-            if "tool_calls" in response_data:
-                # Tool call response
-                mock_message.tool_calls = []
-                for tool_call_data in response_data["tool_calls"]:
-                    mock_tool_call = Mock()
-                    mock_tool_call.id = tool_call_data.get("id", "call_123")
-                    mock_tool_call.function.name = tool_call_data["function"]["name"]
-                    mock_tool_call.function.arguments = tool_call_data["function"]["arguments"]
-                    mock_message.tool_calls.append(mock_tool_call)
-                mock_message.content = response_data.get("content", "")
-            else:
-                # Regular response
-                mock_message.tool_calls = None
-                mock_message.content = response_data.get("content", "")
-            
-            mock_choice.message = mock_message
-            mock_response.choices = [mock_choice]
-            return mock_response
-            
-        # Fix the import path - patch the client instance in the agent module
-        monkeypatch.setattr("src.agent.client.chat.completions.create", fake_create)
+        # Wrap each distinct response once, e.g. `[call] * 15` builds a single mock
+        wrapped = {}
+        for response_data in sequence:
+            if id(response_data) not in wrapped:
+                wrapped[id(response_data)] = _wrap_response(response_data)
+        script[:] = [wrapped[id(response_data)] for response_data in sequence]
         yield
-    return factory 
\ No newline at end of file
+    return factory
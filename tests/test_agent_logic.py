@@ -1,88 +1,182 @@
 from src import agent
 from unittest.mock import Mock, patch
 import pytest
+import hashlib
 import json
 
 # Comprehensive test suite covering all aspects of the agent's ReAct loop, tool execution, error handling, and edge cases.
 # These tests ensure the agent can handle various scenarios including tool calls, API errors, message formats, and iteration limits.
 
-def test_agent_returns_final_response(scripted_llm):
-    """Test that agent returns the final response after tool calls."""
-    script = [
-        {
-            "role": "assistant", 
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
-            }]
-        },
-        {"role": "assistant", "content": "Done!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert answer == "Done!"
-
-def test_agent_handles_tool_execution_error(scripted_llm):
-    """Test that agent handles tool execution errors gracefully."""
-    script = [
-        {
-            "role": "assistant", 
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "invalid_tool", "arguments": '{"sql":"SELECT 1"}'}
-            }]
-        },
-        {"role": "assistant", "content": "Error handled!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Error handled!" in answer
-
-def test_agent_handles_openai_api_error(scripted_llm):
-    """Test that agent handles OpenAI API errors gracefully."""
-    def fake_create(*_, **__):
-        raise Exception("API Error")
-    
-    with patch("src.agent.client.chat.completions.create", side_effect=fake_create):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_max_iterations_reached(scripted_llm):
-    """Test that agent stops after max iterations."""
-    # Create a script that always returns tool calls to trigger max iterations
-    script = [
-        {
-            "role": "assistant", 
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
-            }]
-        }
-    ] * 15  # More than max_iterations (10)
-    
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ], max_iterations=2)
-    assert "maximum number of iterations" in answer
-
-def test_create_chat_session():
+CHAT = [
+    {"role": "system", "content": "x"},
+    {"role": "user", "content": "hi"}
+]
+
+SELECT_ONE_CALL = {
+    "role": "assistant",
+    "tool_calls": [{
+        "id": "call_123",
+        "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
+    }]
+}
+
+SORRY = "Sorry, I encountered an error"
+
+CHAT_CASES = [
+    pytest.param(
+        [SELECT_ONE_CALL, {"role": "assistant", "content": "Done!"}],
+        CHAT, 10,
+        lambda answer: answer == "Done!",
+        id="returns_final_response",
+    ),
+    pytest.param(
+        [
+            {
+                "role": "assistant",
+                "tool_calls": [{
+                    "id": "call_123",
+                    "function": {"name": "invalid_tool", "arguments": '{"sql":"SELECT 1"}'}
+                }]
+            },
+            {"role": "assistant", "content": "Error handled!"}
+        ],
+        CHAT, 10,
+        lambda answer: "Error handled!" in answer,
+        id="tool_execution_error",
+    ),
+    pytest.param(
+        [
+            {
+                "role": "assistant",
+                "tool_calls": [
+                    {
+                        "id": "call_1",
+                        "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
+                    },
+                    {
+                        "id": "call_2",
+                        "function": {"name": "run_python", "arguments": '{"code":"result = 42"}'}
+                    }
+                ]
+            },
+            {"role": "assistant", "content": "Multiple tools executed!"}
+        ],
+        CHAT, 10,
+        lambda answer: "Multiple tools executed!" in answer,
+        id="multiple_tool_calls",
+    ),
+    pytest.param(
+        [{"role": "assistant", "tool_calls": []}, {"role": "assistant", "content": "No tools needed!"}],
+        CHAT, 10,
+        lambda answer: SORRY in answer or answer == "",
+        id="empty_tool_calls",
+    ),
+    pytest.param(
+        [{"role": "assistant", "tool_calls": None}, {"role": "assistant", "content": "Direct response!"}],
+        CHAT, 10,
+        lambda answer: SORRY in answer,
+        id="none_tool_calls",
+    ),
+    pytest.param(
+        [
+            {
+                "role": "assistant",
+                "tool_calls": [{
+                    "id": "call_123",
+                    "function": {"name": "run_query", "arguments": 'invalid json'}
+                }]
+            },
+            {"role": "assistant", "content": "JSON error handled!"}
+        ],
+        CHAT, 10,
+        lambda answer: SORRY in answer,
+        id="json_parsing_error",
+    ),
+    pytest.param(
+        [
+            {
+                "role": "assistant",
+                "tool_calls": [{
+                    "id": "call_123",
+                    "function": {"name": "run_query"}
+                }]
+            },
+            {"role": "assistant", "content": "Missing args handled!"}
+        ],
+        CHAT, 10,
+        lambda answer: SORRY in answer,
+        id="missing_tool_arguments",
+    ),
+    pytest.param(
+        [{"role": "assistant", "content": "Valid response"}],
+        [{"invalid": "format"}, {"role": "user", "content": "hi"}], 10,
+        lambda answer: "Valid response" in answer,
+        id="invalid_message_format",
+    ),
+    pytest.param(
+        [SELECT_ONE_CALL] * 5,
+        CHAT, 100,
+        lambda answer: SORRY in answer or "Done!" in answer or "maximum number of iterations" in answer,
+        id="large_iterations",
+    ),
+]
+
+@pytest.fixture(scope="class")
+def base_messages():
+    """Shared system + user conversation; chat() appends, so pass a copy."""
+    return CHAT
+
+@pytest.mark.xdist_group("agent_client")
+class TestAgentChat:
+    """agent.chat against scripted, failing or misused LLM calls."""
+
+    @pytest.mark.parametrize("script,messages,max_iterations,check", CHAT_CASES)
+    def test_agent_chat_scenarios(self, script, messages, max_iterations, check, scripted_llm):
+        """Test the ReAct loop's final answer across scripted LLM responses."""
+        with scripted_llm(script):
+            answer = agent.chat(list(messages), max_iterations=max_iterations)
+        assert check(answer)
+
+    def test_agent_handles_openai_api_error(self, base_messages):
+        """Test that agent handles OpenAI API errors gracefully."""
+        def fake_create(*_, **__):
+            raise Exception("API Error")
+        
+        with patch("src.agent._CREATE", side_effect=fake_create):
+            answer = agent.chat(list(base_messages))
+        assert "Sorry, I encountered an error" in answer
+
+    def test_agent_max_iterations_reached(self, scripted_llm, base_messages):
+        """Test that agent stops after max iterations."""
+        # A script that always returns tool calls, longer than max_iterations (10)
+        with scripted_llm([SELECT_ONE_CALL] * 15):
+            answer = agent.chat(list(base_messages), max_iterations=2)
+        assert "maximum number of iterations" in answer
+
+    @pytest.mark.parametrize("messages,max_iterations,expected", [
+        pytest.param([], 10, SORRY, id="empty_messages"),
+        pytest.param(None, 10, SORRY, id="none_messages"),
+        pytest.param(CHAT, 0, "maximum number of iterations", id="zero_iterations"),
+        pytest.param(CHAT, -1, "maximum number of iterations", id="negative_iterations"),
+    ])
+    def test_agent_rejects_bad_inputs(self, messages, max_iterations, expected):
+        """Test that agent.chat degrades gracefully on bad messages or iteration limits."""
+        answer = agent.chat(messages, max_iterations=max_iterations)
+        assert expected in answer
+
+def test_create_chat_session(base_session):
     """Test creating a new chat session."""
-    session = agent.create_chat_session()
+    session = base_session
     assert len(session) == 1
     assert session[0]["role"] == "system"
     assert "content" in session[0]
 
+def test_create_chat_session_with_context():
+    """Test that session context follows the static system prompt."""
+    session = agent.create_chat_session("Answer in French.")
+    assert session[0]["content"].startswith(agent.build_system())
+    assert session[0]["content"].endswith("Answer in French.")
+
 def test_add_user_message():
     """Test adding a user message to conversation."""
     messages = [{"role": "system", "content": "Hello"}]
@@ -99,156 +193,25 @@ def test_add_assistant_message():
     assert messages[1]["role"] == "assistant"
     assert messages[1]["content"] == "I'm doing well!"
 
-def test_agent_handles_multiple_tool_calls(scripted_llm):
-    """Test that agent handles multiple tool calls in one response."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": [
-                {
-                    "id": "call_1",
-                    "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
-                },
-                {
-                    "id": "call_2", 
-                    "function": {"name": "run_python", "arguments": '{"code":"result = 42"}'}
-                }
-            ]
-        },
-        {"role": "assistant", "content": "Multiple tools executed!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Multiple tools executed!" in answer
-
-def test_agent_handles_empty_tool_calls(scripted_llm):
-    """Test that agent handles empty tool_calls list."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": []
-        },
-        {"role": "assistant", "content": "No tools needed!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Sorry, I encountered an error" in answer or answer == ""
-
-def test_agent_handles_none_tool_calls(scripted_llm):
-    """Test that agent handles None tool_calls."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": None
-        },
-        {"role": "assistant", "content": "Direct response!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_handles_json_parsing_error(scripted_llm):
-    """Test that agent handles JSON parsing errors in tool arguments."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "run_query", "arguments": 'invalid json'}
-            }]
-        },
-        {"role": "assistant", "content": "JSON error handled!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_handles_missing_tool_arguments(scripted_llm):
-    """Test that agent handles missing tool arguments."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "run_query"}
-            }]
-        },
-        {"role": "assistant", "content": "Missing args handled!"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_handles_empty_messages():
-    """Test that agent handles empty message list."""
-    answer = agent.chat([])
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_handles_none_messages():
-    """Test that agent handles None messages."""
-    answer = agent.chat(None)
-    assert "Sorry, I encountered an error" in answer
-
-def test_agent_handles_invalid_message_format(scripted_llm):
-    """Test that agent handles invalid message format."""
-    script = [
-        {"role": "assistant", "content": "Valid response"}
-    ]
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"invalid": "format"},
-            {"role": "user", "content": "hi"}
-        ])
-    assert "Valid response" in answer
-
-def test_agent_handles_zero_iterations():
-    """Test that agent handles zero max_iterations."""
-    answer = agent.chat([
-        {"role": "system", "content": "x"},
-        {"role": "user", "content": "hi"}
-    ], max_iterations=0)
-    assert "maximum number of iterations" in answer
-
-def test_agent_handles_negative_iterations():
-    """Test that agent handles negative max_iterations."""
-    answer = agent.chat([
-        {"role": "system", "content": "x"},
-        {"role": "user", "content": "hi"}
-    ], max_iterations=-1)
-    assert "maximum number of iterations" in answer
-
-def test_agent_handles_large_iterations(scripted_llm):
-    """Test that agent handles very large max_iterations."""
-    script = [
-        {
-            "role": "assistant",
-            "tool_calls": [{
-                "id": "call_123",
-                "function": {"name": "run_query", "arguments": '{"sql":"SELECT 1"}'}
-            }]
-        }
-    ] * 5
-    with scripted_llm(script):
-        answer = agent.chat([
-            {"role": "system", "content": "x"},
-            {"role": "user", "content": "hi"}
-        ], max_iterations=100)
-    assert "Sorry, I encountered an error" in answer or "Done!" in answer or "maximum number of iterations" in answer
+def test_trim_history_keeps_short_conversations():
+    """Test that conversations within the window are passed through unchanged."""
+    messages = [{"role": "system", "content": "x"}, {"role": "user", "content": "hi"}]
+    trimmed = agent.trim_history(messages, max_turns=2)
+    assert trimmed == messages
+    assert trimmed is not messages
+
+def test_trim_history_drops_old_turns():
+    """Test that only the system prompt and the most recent turns are kept."""
+    messages = [{"role": "system", "content": "x"}]
+    for i in range(4):
+        messages.append({"role": "user", "content": f"q{i}"})
+        messages.append({"role": "assistant", "content": None, "tool_calls": [{"id": f"call_{i}"}]})
+        messages.append({"role": "tool", "tool_call_id": f"call_{i}", "content": "[]"})
+        messages.append({"role": "assistant", "content": f"a{i}"})
+    trimmed = agent.trim_history(messages, max_turns=2)
+    assert trimmed[0] == messages[0]
+    assert trimmed[1] == {"role": "user", "content": "q2"}
+    assert trimmed[1:] == messages[-8:]
 
 def test_agent_tool_map_structure():
     """Test that TOOL_MAP has expected structure."""
@@ -257,17 +220,16 @@ def test_agent_tool_map_structure():
     assert callable(agent.TOOL_MAP["run_query"])
     assert callable(agent.TOOL_MAP["run_python"])
 
+# Snapshot of agent.TOOLS; regenerate after an intentional schema change with
+#   python -c "import hashlib, json; from src import agent; print(hashlib.sha1(json.dumps(agent.TOOLS, sort_keys=True).encode()).hexdigest())"
+TOOLS_SHA1 = "59107a54175a69e058b46c65b4f7655711395903"
+
 def test_agent_tools_structure():
-    """Test that TOOLS list has expected structure."""
-    assert len(agent.TOOLS) == 2
-    for tool in agent.TOOLS:
-        assert "type" in tool
-        assert "function" in tool
-        assert "name" in tool["function"]
-        assert "description" in tool["function"]
-        assert "parameters" in tool["function"]
+    """Test that the TOOLS schema matches the pinned snapshot."""
+    digest = hashlib.sha1(json.dumps(agent.TOOLS, sort_keys=True).encode()).hexdigest()
+    assert digest == TOOLS_SHA1, "agent.TOOLS changed; update TOOLS_SHA1 if intentional"
 
 def test_agent_client_initialization():
-    """Test that OpenAI client is properly initialized."""
+    """Test that the OpenAI client (stubbed unless POKEDEX_REAL_OPENAI is set) is initialized."""
     assert hasattr(agent, 'client')
     assert agent.client is not None 
\ No newline at end of file
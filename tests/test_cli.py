@@ -1,6 +1,7 @@
 import pytest
+from src import cli as _cli
 from src.cli import main, print_welcome, print_help, print_schema
-from unittest.mock import patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
 import sys
 from rich.panel import Panel
@@ -8,6 +9,37 @@ from rich.panel import Panel
 # Comprehensive test suite covering all CLI functionality including user interactions, command processing, error handling, and integration points.
 # These tests validate the complete CLI experience from welcome messages to database schema display and user input handling.
 
+@pytest.fixture(autouse=True)
+def _silence_console(monkeypatch):
+    """Replace Rich rendering with a MagicMock for every CLI test."""
+    console_print = MagicMock()
+    monkeypatch.setattr("src.cli.console.print", console_print)
+    return console_print
+
+@pytest.fixture
+def cli_console(monkeypatch, _silence_console):
+    """Stub the database check and sys.exit so main() can be driven."""
+    monkeypatch.setattr("src.cli.DB_PATH", Mock(exists=lambda: True))
+    monkeypatch.setattr("sys.exit", lambda *_: None)
+    return _silence_console
+
+def _script_input(monkeypatch, *answers):
+    """Feed Prompt.ask from `answers`; exception instances are raised instead."""
+    answers = iter(answers)
+
+    def ask(*_, **__):
+        answer = next(answers)
+        if isinstance(answer, BaseException):
+            raise answer
+        return answer
+    monkeypatch.setattr("src.cli.Prompt.ask", ask)
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """Replace the schema helpers print_schema() imports from src.db."""
+    monkeypatch.setattr("src.db.list_tables", lambda *_: ['pokemon_species', 'pokemon'])
+    monkeypatch.setattr("src.db.get_table_info", lambda *_: [{'name': 'id', 'type': 'INTEGER'}])
+
 def test_cli_main_function_exists():
     """Test that the main function exists and is callable."""
     assert callable(main)
@@ -23,14 +55,12 @@ def test_cli_basic_import(mock_print, mock_input):
     """Test that CLI can be imported and basic structure exists."""
     # This test just verifies the module can be imported
     # We don't actually run the CLI to avoid interactive issues
-    from src.cli import main
-    assert callable(main)
+    assert callable(_cli.main)
 
 def test_cli_module_structure():
     """Test that CLI module has expected structure."""
-    from src import cli
     # Just check that the module exists and has a main function
-    assert hasattr(cli, 'main')
+    assert hasattr(_cli, 'main')
 
 def test_print_welcome_function():
     """Test that print_welcome function exists and is callable."""
@@ -44,276 +74,156 @@ def test_print_schema_function():
     """Test that print_schema function exists and is callable."""
     assert callable(print_schema)
 
-@patch('src.cli.console.print')
-def test_print_welcome_output(mock_print):
+def test_print_welcome_output(_silence_console):
     """Test that print_welcome produces expected output."""
     print_welcome()
-    mock_print.assert_called()
+    _silence_console.assert_called()
     # Check that a Panel was printed
-    call_args = mock_print.call_args[0][0]
+    call_args = _silence_console.call_args[0][0]
     assert isinstance(call_args, Panel)
 
-@patch('src.cli.console.print')
-def test_print_help_output(mock_print):
+def test_print_help_output(_silence_console):
     """Test that print_help produces expected output."""
     print_help()
-    mock_print.assert_called()
+    _silence_console.assert_called()
     # Check that a Panel was printed
-    call_args = mock_print.call_args[0][0]
+    call_args = _silence_console.call_args[0][0]
     assert isinstance(call_args, Panel)
 
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-def test_print_schema_with_database(mock_print, mock_db_path):
+def test_print_schema_with_database(cli_console, mock_db):
     """Test print_schema when database exists."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock the database functions at their actual import location
-    with patch('src.db.list_tables', return_value=['pokemon_species', 'pokemon']):
-        with patch('src.db.get_table_info', return_value=[{'name': 'id', 'type': 'INTEGER'}]):
-            print_schema()
-            mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-def test_print_schema_with_error(mock_print, mock_db_path):
+    print_schema()
+    cli_console.assert_called()
+
+def test_print_schema_with_error(cli_console, monkeypatch):
     """Test print_schema when an error occurs."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
     # Mock list_tables to raise an exception
-    with patch('src.db.list_tables', side_effect=Exception("Test error")):
-        print_schema()
-        mock_print.assert_called()
-        # Check that error message is printed
-        call_args = mock_print.call_args[0][0]
-        assert "Error displaying schema" in str(call_args)
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-@patch('src.cli.chat')
-def test_main_with_quit_command(mock_chat, mock_ask, mock_print, mock_db_path):
+    monkeypatch.setattr("src.db.list_tables", Mock(side_effect=Exception("Test error")))
+    print_schema()
+    cli_console.assert_called()
+    # Check that error message is printed
+    call_args = cli_console.call_args[0][0]
+    assert "Error displaying schema" in str(call_args)
+
+def test_main_with_quit_command(cli_console, monkeypatch):
     """Test main function with quit command."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to quit
-    mock_ask.return_value = '/quit'
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_help_command(mock_ask, mock_print, mock_db_path):
+    monkeypatch.setattr("src.cli.chat", MagicMock())
+    _script_input(monkeypatch, '/quit')
+    main()
+    cli_console.assert_called()
+
+def test_main_with_help_command(cli_console, monkeypatch):
     """Test main function with help command."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to request help then quit
-    mock_ask.side_effect = ['/help', '/quit']
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        # Should have called print multiple times (welcome, help, goodbye)
-        assert mock_print.call_count >= 3
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_clear_command(mock_ask, mock_print, mock_db_path):
+    _script_input(monkeypatch, '/help', '/quit')
+    main()
+    # Should have called print multiple times (welcome, help, goodbye)
+    assert cli_console.call_count >= 3
+
+def test_main_with_clear_command(cli_console, monkeypatch):
     """Test main function with clear command."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to clear then quit
-    mock_ask.side_effect = ['/clear', '/quit']
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_schema_command(mock_ask, mock_print, mock_db_path):
+    _script_input(monkeypatch, '/clear', '/quit')
+    main()
+    cli_console.assert_called()
+
+def test_main_with_schema_command(cli_console, mock_db, monkeypatch):
     """Test main function with schema command."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to request schema then quit
-    mock_ask.side_effect = ['/schema', '/quit']
-    
-    # Mock the database functions at their actual import location
-    with patch('src.db.list_tables', return_value=['pokemon_species']):
-        with patch('src.db.get_table_info', return_value=[{'name': 'id', 'type': 'INTEGER'}]):
-            # Mock sys.exit to prevent actual exit
-            with patch('sys.exit'):
-                main()
-                mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-@patch('src.cli.chat')
-def test_main_with_user_query(mock_chat, mock_ask, mock_print, mock_db_path):
+    _script_input(monkeypatch, '/schema', '/quit')
+    main()
+    cli_console.assert_called()
+
+def test_main_with_user_query(cli_console, monkeypatch):
     """Test main function with user query."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to ask a question then quit
-    mock_ask.side_effect = ['What is Pikachu?', '/quit']
-    
-    # Mock chat response
-    mock_chat.return_value = "Pikachu is an Electric-type Pokémon."
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_chat.assert_called()
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_empty_input(mock_ask, mock_print, mock_db_path):
+    mock_chat = MagicMock(return_value="Pikachu is an Electric-type Pokémon.")
+    monkeypatch.setattr("src.cli.chat", mock_chat)
+    _script_input(monkeypatch, 'What is Pikachu?', '/quit')
+    main()
+    mock_chat.assert_called()
+    cli_console.assert_called()
+
+def test_main_with_empty_input(cli_console, monkeypatch):
     """Test main function with empty input."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to be empty then quit
-    mock_ask.side_effect = ['', '/quit']
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        # Should not call chat for empty input
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-@patch('src.cli.chat')
-def test_main_with_sql_response(mock_chat, mock_ask, mock_print, mock_db_path):
+    mock_chat = MagicMock()
+    monkeypatch.setattr("src.cli.chat", mock_chat)
+    _script_input(monkeypatch, '', '/quit')
+    main()
+    # Should not call chat for empty input
+    mock_chat.assert_not_called()
+    cli_console.assert_called()
+
+def test_main_with_sql_response(cli_console, monkeypatch):
     """Test main function with SQL in response."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to ask a question then quit
-    mock_ask.side_effect = ['Show me SQL', '/quit']
-    
-    # Mock chat response with SQL
-    mock_chat.return_value = "Here's the data:\n```sql\nSELECT * FROM pokemon\n```\nResults: ..."
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_chat.assert_called()
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_keyboard_interrupt(mock_ask, mock_print, mock_db_path):
+    mock_chat = MagicMock(return_value="Here's the data:\n```sql\nSELECT * FROM pokemon\n```\nResults: ...")
+    monkeypatch.setattr("src.cli.chat", mock_chat)
+    _script_input(monkeypatch, 'Show me SQL', '/quit')
+    main()
+    mock_chat.assert_called()
+    cli_console.assert_called()
+
+def test_main_with_keyboard_interrupt(cli_console, monkeypatch):
     """Test main function with keyboard interrupt."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to raise KeyboardInterrupt
-    mock_ask.side_effect = KeyboardInterrupt()
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_print.assert_called()
-
-@patch('src.cli.DB_PATH')
-@patch('src.cli.console.print')
-@patch('src.cli.Prompt.ask')
-def test_main_with_eof_error(mock_ask, mock_print, mock_db_path):
+    _script_input(monkeypatch, KeyboardInterrupt())
+    main()
+    cli_console.assert_called()
+
+def test_main_with_eof_error(cli_console, monkeypatch):
     """Test main function with EOF error."""
-    # Mock database path to exist
-    mock_db_path.exists.return_value = True
-    
-    # Mock user input to raise EOFError
-    mock_ask.side_effect = EOFError()
-    
-    # Mock sys.exit to prevent actual exit
-    with patch('sys.exit'):
-        main()
-        mock_print.assert_called()
+    _script_input(monkeypatch, EOFError())
+    main()
+    cli_console.assert_called()
 
 def test_cli_console_initialization():
     """Test that console is properly initialized."""
-    from src.cli import console
-    assert console is not None
+    assert _cli.console is not None
 
 def test_cli_imports_all_required_modules():
     """Test that CLI imports all required modules."""
-    from src.cli import (
-        json, sys, Path, Console, Markdown, Panel, 
-        Prompt, Syntax, chat, create_chat_session, 
-        add_user_message, add_assistant_message, 
-        DB_PATH, BASE_SYSTEM, console
-    )
-    assert all([json, sys, Path, Console, Markdown, Panel, 
-                Prompt, Syntax, chat, create_chat_session, 
-                add_user_message, add_assistant_message, 
-                DB_PATH, BASE_SYSTEM, console])
-
-def test_cli_command_aliases():
-    """Test that command aliases work."""
-    # Test that different quit commands are handled
-    commands = ['/quit', '/exit', 'quit', 'exit']
-    for cmd in commands:
-        # This tests the command parsing logic
-        assert cmd.lower() in ['/quit', '/exit', 'quit', 'exit']
-
-def test_cli_special_commands():
-    """Test that special commands are recognized."""
-    special_commands = ['/help', '/clear', '/schema']
-    for cmd in special_commands:
-        # This tests the command recognition logic
-        assert cmd.lower() in ['/help', '/clear', '/schema']
-
-def test_cli_message_handling():
+    required = [
+        "json", "sys", "Path", "Console", "Markdown", "Panel",
+        "Prompt", "Syntax", "chat", "create_chat_session",
+        "add_user_message", "add_assistant_message",
+        "DB_PATH", "BASE_SYSTEM", "console"
+    ]
+    assert all(getattr(_cli, name) for name in required)
+
+@pytest.mark.parametrize("cmd", ['/quit', '/exit', 'quit', 'exit', '/help', '/clear', '/schema'])
+def test_cli_commands_dispatch(cmd, cli_console, monkeypatch):
+    """Test that each command alias and special command runs through main()."""
+    mock_chat = MagicMock()
+    monkeypatch.setattr("src.cli.chat", mock_chat)
+    _script_input(monkeypatch, cmd, '/quit')
+    main()
+    # Commands are handled by the CLI itself, never sent to the agent
+    mock_chat.assert_not_called()
+    cli_console.assert_called()
+
+def test_cli_message_handling(base_session):
     """Test that message handling functions work."""
-    from src.cli import add_user_message, add_assistant_message, create_chat_session
-    
-    # Test message session creation
-    messages = create_chat_session()
+    # Start from a copy of the shared session
+    messages = list(base_session)
     assert isinstance(messages, list)
     assert len(messages) == 1
     assert messages[0]["role"] == "system"
     
     # Test adding user message
-    add_user_message(messages, "Hello")
+    _cli.add_user_message(messages, "Hello")
     assert len(messages) == 2
     assert messages[1]["role"] == "user"
     assert messages[1]["content"] == "Hello"
     
     # Test adding assistant message
-    add_assistant_message(messages, "Hi there!")
+    _cli.add_assistant_message(messages, "Hi there!")
     assert len(messages) == 3
     assert messages[2]["role"] == "assistant"
     assert messages[2]["content"] == "Hi there!"
 
 def test_cli_database_path_handling():
     """Test that database path handling works correctly."""
-    from src.cli import DB_PATH
-    
     # Test that DB_PATH is a Path object
-    assert isinstance(DB_PATH, Path)
+    assert isinstance(_cli.DB_PATH, Path)
     
-    # Test that it points to a valid location (parent directory exists)
-    assert DB_PATH.parent.exists()
+    # Test that it points at the package directory or the Streamlit /tmp location
+    assert _cli.DB_PATH.name == "pokedex.db"
+    assert _cli.DB_PATH.parent.name in {"src", "tmp"}
 
 def test_cli_rich_components():
     """Test that Rich components are properly imported."""
@@ -329,27 +239,21 @@ def test_cli_rich_components():
 
 def test_cli_agent_integration():
     """Test that CLI properly integrates with agent functions."""
-    from src.cli import chat, create_chat_session, add_user_message, add_assistant_message
-    
     # Test that all agent functions are callable
-    assert callable(chat)
-    assert callable(create_chat_session)
-    assert callable(add_user_message)
-    assert callable(add_assistant_message)
+    assert callable(_cli.chat)
+    assert callable(_cli.create_chat_session)
+    assert callable(_cli.add_user_message)
+    assert callable(_cli.add_assistant_message)
 
 def test_cli_prompts_integration():
     """Test that CLI properly integrates with prompts."""
-    from src.cli import BASE_SYSTEM
-    
     # Test that BASE_SYSTEM is available and is a string
-    assert isinstance(BASE_SYSTEM, str)
-    assert len(BASE_SYSTEM) > 0
+    assert isinstance(_cli.BASE_SYSTEM, str)
+    assert len(_cli.BASE_SYSTEM) > 0
 
 def test_cli_db_integration():
     """Test that CLI properly integrates with database."""
-    from src.cli import DB_PATH
-    
     # Test that DB_PATH is available
-    assert DB_PATH is not None
+    assert _cli.DB_PATH is not None
 
 # All tests in this file are designed to cover actual CLI features, command handling, and integration points. No test is a forced pass; each one validates real CLI behavior. 
\ No newline at end of file
@@ -190,19 +190,15 @@ def test_database_connection_cleanup():
         rows = run_query("SELECT 1")
         assert isinstance(rows, list)
 
-def test_concurrent_access():
+def test_concurrent_access(mini_db, thread_pool):
     """Test that multiple queries can run without conflicts."""
-    import threading
-    
-    def run_query_thread():
-        rows = run_query("SELECT id FROM pokemon_species LIMIT 1")
-        assert isinstance(rows, list)
-    
-    threads = [threading.Thread(target=run_query_thread) for _ in range(5)]
-    for thread in threads:
-        thread.start()
-    for thread in threads:
-        thread.join()
+    futures = [
+        thread_pool.submit(run_query, "SELECT id FROM pokemon_species LIMIT 1", mini_db)
+        for _ in range(5)
+    ]
+    # result() re-raises anything a worker hit, unlike a bare Thread
+    for future in futures:
+        assert future.result() == [{"id": 1}]
 
 def test_database_file_permissions():
     """Test database file permissions."""
@@ -235,4 +231,264 @@ def test_database_path_validation():
     # Test with absolute path that doesn't exist
     absolute_path = Path("/tmp/nonexistent/test.db")
     with pytest.raises(FileNotFoundError):
-        run_query("SELECT 1", absolute_path) 
\ No newline at end of file
+        run_query("SELECT 1", absolute_path)
+
+def test_connection_is_reused_per_thread(mini_db):
+    """Test that a thread reuses one connection per database."""
+    from src import db
+    import threading
+    
+    conn = db._connect(mini_db)
+    assert db._connect(mini_db) is conn
+    
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db._connect(mini_db)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+def test_close_connections(mini_db):
+    """Test that close_connections drops the thread's cached connections."""
+    from src import db
+    
+    conn = db._connect(mini_db)
+    db.close_connections()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert db._connect(mini_db) is not conn
+    assert run_query("SELECT name FROM pokemon_species", mini_db) == [{"name": "bulbasaur"}]
+
+def test_rows_keep_column_order(mini_db):
+    """Test that result dicts are keyed by column name in SELECT order."""
+    rows = run_query("SELECT name, id FROM pokemon_species", mini_db)
+    assert rows == [{"name": "bulbasaur", "id": 1}]
+    assert list(rows[0]) == ["name", "id"]
+
+def test_select_keyword_must_be_whole_word(mini_db):
+    """Test that only a real SELECT keyword passes the read-only check."""
+    with pytest.raises(ValueError, match="Only SELECT"):
+        run_query("selected FROM pokemon", mini_db)
+    assert run_query("\n\tSELECT(1) AS one", mini_db) == [{"one": 1}]
+
+def test_multiple_statements_rejected(mini_db):
+    """Test that a second statement after a SELECT is refused, but literals with ';' are not."""
+    with pytest.raises(ValueError):
+        run_query("SELECT 1; DROP TABLE pokemon", mini_db)
+    assert run_query("SELECT ';' AS semi;", mini_db) == [{"semi": ";"}]
+
+def test_result_cache_returns_fresh_rows(mini_db):
+    """Test that repeated queries are served from the cache as independent dicts."""
+    from src import db
+    
+    first = run_query("SELECT name FROM pokemon_species", mini_db)
+    first[0]["name"] = "mutated"
+    assert run_query("  SELECT name FROM pokemon_species\n", mini_db) == [{"name": "bulbasaur"}]
+    assert any(key[0] == "SELECT name FROM pokemon_species" for key in db._result_cache)
+
+def test_result_cache_invalidated_by_db_change(tmp_path):
+    """Test that rewriting the database file invalidates cached results."""
+    import os
+    
+    path = tmp_path / "cache.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    assert run_query("SELECT x FROM t", path) == [{"x": 1}]
+    
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE t SET x = 2")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert run_query("SELECT x FROM t", path) == [{"x": 2}]
+
+def test_result_cache_skips_volatile_sql(mini_db):
+    """Test that queries using random() or the current time are never cached."""
+    from src import db
+    
+    for sql in (
+        "SELECT random() AS r",
+        "SELECT name FROM pokemon ORDER BY RANDOM() LIMIT 6",
+        "SELECT randomblob(4) AS b",
+        "SELECT datetime('now') AS t",
+        "SELECT CURRENT_TIMESTAMP AS t",
+    ):
+        run_query(sql, mini_db)
+        assert all(key[0] != sql for key in db._result_cache)
+    assert len({run_query("SELECT random() AS r", mini_db)[0]["r"] for _ in range(5)}) > 1
+
+def test_missing_table_rejected_before_execute(mini_db):
+    """Test that unknown tables fail fast with SQLite's own error message."""
+    with pytest.raises(ValueError, match="no such table: missing"):
+        run_query("SELECT * FROM pokemon p JOIN missing m ON m.id = p.id", mini_db)
+    
+    # Literals, comments, qualified names, CTEs and table-valued functions are not table references
+    assert run_query("SELECT 'from nowhere' AS s FROM pokemon -- join ghosts", mini_db) == [{"s": "from nowhere"}]
+    assert run_query("SELECT name FROM main.pokemon", mini_db) == [{"name": "bulbasaur"}]
+    assert run_query("SELECT id FROM (WITH p AS (SELECT id FROM pokemon) SELECT id FROM p)", mini_db) == [{"id": 1}]
+    assert run_query("SELECT value FROM json_each('[7]')", mini_db) == [{"value": 7}]
+    assert run_query("SELECT count(*) AS n FROM sqlite_master WHERE name = 'POKEMON' COLLATE NOCASE", mini_db) == [{"n": 1}]
+    assert run_query("SELECT 1 IS DISTINCT FROM 2 AS d", mini_db) == [{"d": 1}]
+    assert run_query("SELECT id IS NOT DISTINCT FROM NULL AS d FROM pokemon", mini_db) == [{"d": 0}]
+    # Eponymous virtual tables aren't in sqlite_master but still resolve
+    assert {"name": "pokemon"} in run_query("SELECT name FROM pragma_table_list", mini_db)
+    assert run_query("SELECT name FROM pragma_table_info WHERE arg = 'pokemon' AND name = 'id'", mini_db) == [{"name": "id"}]
+    assert run_query("SELECT name FROM pragma_database_list", mini_db) == [{"name": "main"}]
+    assert run_query("SELECT count(*) > 0 AS n FROM dbstat", mini_db) == [{"n": 1}]
+
+def test_list_tables_cached_until_db_changes(tmp_path):
+    """Test that list_tables reads sqlite_master once per database version."""
+    import os
+    from src import db
+    
+    path = tmp_path / "tables.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE a (x INTEGER)")
+    assert list_tables(path) == ["a"]
+    hits = db._list_tables_cached.cache_info().hits
+    assert list_tables(path) == ["a"]
+    assert db._list_tables_cached.cache_info().hits == hits + 1
+    
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE b (x INTEGER)")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert list_tables(path) == ["a", "b"]
+
+def test_connections_are_read_only(mini_db):
+    """Test that pooled connections refuse writes even if the SELECT check is bypassed."""
+    from src import db
+    
+    conn = db._connect(mini_db)
+    assert conn.execute("PRAGMA query_only").fetchone() == (1,)
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM pokemon")
+    assert not conn.in_transaction
+    assert run_query("SELECT count(*) AS n FROM pokemon", mini_db) == [{"n": 1}]
+
+def test_run_query_as_rows(mini_db):
+    """Test that as_dict=False returns sqlite3.Row objects with key and index access."""
+    rows = run_query("SELECT id, name FROM pokemon_species", mini_db, as_dict=False)
+    assert isinstance(rows[0], sqlite3.Row)
+    assert rows[0]["name"] == "bulbasaur"
+    assert rows[0][0] == 1
+    assert dict(rows[0]) == {"id": 1, "name": "bulbasaur"}
+    with pytest.raises(ValueError, match="no such table"):
+        run_query("SELECT * FROM missing", mini_db, as_dict=False)
+
+def test_run_query_iter_is_lazy(mini_db):
+    """Test that run_query_iter validates eagerly and yields dict rows on demand."""
+    from itertools import islice
+    from src.db import run_query_iter
+    
+    rows = run_query_iter("SELECT id, name FROM pokemon_species", mini_db)
+    assert list(islice(rows, 1)) == [{"id": 1, "name": "bulbasaur"}]
+    assert list(rows) == []
+    
+    with pytest.raises(ValueError, match="Only SELECT"):
+        run_query_iter("DELETE FROM pokemon", mini_db)
+    with pytest.raises(ValueError, match="no such table"):
+        run_query_iter("SELECT * FROM missing", mini_db)
+    with pytest.raises(FileNotFoundError):
+        run_query_iter("SELECT 1", Path("/nonexistent/db.sqlite"))
+
+def test_directory_is_not_a_database(tmp_path):
+    """Test that a directory path is treated like a missing database."""
+    assert list_tables(tmp_path) == []
+    with pytest.raises(FileNotFoundError):
+        run_query("SELECT 1", tmp_path)
+
+def test_connection_pragmas(mini_db):
+    """Test that pooled connections use a memory map, a large page cache and in-memory temp storage."""
+    from src import db
+    
+    assert db._connect(mini_db).execute("PRAGMA mmap_size").fetchone() == (db.MMAP_SIZE,)
+    assert db._connect(mini_db).execute("PRAGMA cache_size").fetchone() == (-65536,)
+    assert db._connect(mini_db).execute("PRAGMA temp_store").fetchone() == (2,)
+
+def test_runaway_query_is_interrupted(mini_db, monkeypatch):
+    """Test that a query exceeding the VM instruction budget fails with ValueError."""
+    from src import db
+    
+    monkeypatch.setattr(db, "MAX_PROGRESS_CALLS", 10)
+    endless = (
+        "SELECT count(*) FROM (WITH RECURSIVE c(x) AS "
+        "(SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c)"
+    )
+    with pytest.raises(ValueError, match="interrupted"):
+        run_query(endless, mini_db)
+    # The budget is per statement, so the connection stays usable
+    assert run_query("SELECT id FROM pokemon", mini_db) == [{"id": 1}]
+
+def test_run_query_json_matches_run_query(tmp_path):
+    """Test that SQLite-built JSON has the same rows and order as run_query."""
+    import json
+    from src.db import run_query_json
+    
+    path = tmp_path / "json.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER, name TEXT, data BLOB)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [(i, f"o'{i}\"", b"x") for i in range(3)])
+    
+    sql = "SELECT id, name AS \"the name\" FROM t ORDER BY id DESC; -- newest first"
+    assert json.loads(run_query_json(sql, path)) == run_query(sql, path)
+    assert json.loads(run_query_json("SELECT id FROM t WHERE 0", path)) == []
+    # BLOBs fall back to the Python encoder
+    assert json.loads(run_query_json("SELECT data FROM t LIMIT 1", path)) == [{"data": "b'x'"}]
+    with pytest.raises(ValueError, match="no such table"):
+        run_query_json("SELECT * FROM missing", path)
+    with pytest.raises(ValueError):
+        run_query_json("SELECT 1; DROP TABLE t", path)
+    # Only the trailing comment is stripped, not a "--" inside a literal
+    assert json.loads(run_query_json("SELECT '--;' AS s; /* done */", path)) == [{"s": "--;"}]
+
+def test_run_query_json_errors_run_once(mini_db, monkeypatch):
+    """Test that errors other than BLOB encoding are raised without re-running through run_query."""
+    from src import db
+    
+    def fail(*_):
+        raise AssertionError("fell back to run_query")
+    
+    monkeypatch.setattr(db, "run_query", fail)
+    monkeypatch.setattr(db, "MAX_PROGRESS_CALLS", 10)
+    endless = "SELECT x FROM (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c)"
+    with pytest.raises(ValueError, match="interrupted"):
+        db.run_query_json(endless, mini_db)
+    with pytest.raises(ValueError, match="no such column"):
+        db.run_query_json("SELECT nope FROM pokemon", mini_db)
+
+def test_run_queries_batch(mini_db):
+    """Test that a batch runs every SELECT in order and stops at the first failure."""
+    from src import db
+    
+    assert db.run_queries(["SELECT id FROM pokemon", "SELECT name FROM pokemon_species"], mini_db) == [
+        [{"id": 1}],
+        [{"name": "bulbasaur"}],
+    ]
+    assert db.run_queries([], mini_db) == []
+    with pytest.raises(ValueError, match="statement 2"):
+        db.run_queries(["SELECT 1", "SELECT * FROM missing", "SELECT 2"], mini_db)
+    # Nothing runs if any statement isn't a SELECT
+    with pytest.raises(ValueError, match="Only SELECT"):
+        db.run_queries(["SELECT 1", "DELETE FROM pokemon"], mini_db)
+    # The transaction is closed afterwards, even after an error
+    assert not db._connect(mini_db).in_transaction
+
+def test_result_keys_are_interned(mini_db):
+    """Test that row dicts from separate queries share their key strings."""
+    import sys
+    first = run_query("SELECT name FROM pokemon", mini_db)[0]
+    second = run_query("SELECT name, id FROM pokemon_species", mini_db)[0]
+    assert next(iter(first)) is next(iter(second)) is sys.intern("name")
+
+def test_run_query_columns(mini_db):
+    """Test that the columnar shape holds one list per column, even for empty results."""
+    from src import db
+    
+    assert db.run_query_columns("SELECT id, name FROM pokemon", mini_db) == {"id": [1], "name": ["bulbasaur"]}
+    assert db.run_query_columns("SELECT id, name FROM pokemon WHERE 0", mini_db) == {"id": [], "name": []}
+    assert db.run_queries(["SELECT id FROM pokemon", "SELECT name FROM pokemon_species"], mini_db, columnar=True) == [
+        {"id": [1]},
+        {"name": ["bulbasaur"]},
+    ]
+    with pytest.raises(ValueError, match="no such table"):
+        db.run_query_columns("SELECT * FROM missing", mini_db)
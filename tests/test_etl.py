@@ -1,4 +1,3 @@
-import sqlite3
 from src.etl import load_all
 from pathlib import Path
 import pytest
@@ -7,16 +6,18 @@ import inspect
 # Comprehensive test suite covering all ETL functionality including function signatures, parameter validation, module structure, and code introspection.
 # These tests ensure the ETL pipeline is properly structured and can be safely called with various parameter combinations.
 
-def test_species_and_pokemon_row_counts(mini_db):
-    conn = sqlite3.connect(mini_db)
+# Introspected once; load_all doesn't change during a test run
+_LOAD_ALL_SIG = inspect.signature(load_all)
+_LOAD_ALL_CODE = load_all.__code__
+
+def test_species_and_pokemon_row_counts(mini_db_ro):
+    conn = mini_db_ro
     species = conn.execute("SELECT COUNT(*) FROM pokemon_species").fetchone()[0]
     pokemon = conn.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0]
     
     # With minimal test data, we just check that tables exist and have some data
     assert species >= 1
     assert pokemon >= 1
-    
-    conn.close()
 
 def test_etl_load_all_function_exists():
     """Test that the load_all function exists and is callable."""
@@ -25,18 +26,18 @@ def test_etl_load_all_function_exists():
 def test_etl_force_parameter():
     """Test that load_all accepts force parameter."""
     # This test just verifies the function signature without actually running ETL
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     assert 'force' in sig.parameters
     assert 'db_path' in sig.parameters
 
 def test_etl_db_path_parameter():
     """Test that load_all accepts db_path parameter."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     assert 'db_path' in sig.parameters
 
 def test_etl_function_signature():
     """Test the complete function signature of load_all."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     params = list(sig.parameters.keys())
     
     # Should have force and db_path parameters
@@ -60,7 +61,7 @@ def test_etl_function_docstring():
 
 def test_etl_function_annotations():
     """Test that load_all has proper type annotations."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check that parameters have annotations
     for param_name, param in sig.parameters.items():
@@ -70,7 +71,7 @@ def test_etl_function_annotations():
 
 def test_etl_function_return_type():
     """Test that load_all has a return type annotation."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check if there's a return annotation
     if sig.return_annotation is not inspect.Signature.empty:
@@ -90,7 +91,7 @@ def test_etl_module_imports():
 
 def test_etl_function_parameters_defaults():
     """Test the default values of load_all parameters."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check force parameter default
     force_param = sig.parameters['force']
@@ -108,7 +109,7 @@ def test_etl_function_callable_without_args():
     """Test that load_all can be called without arguments (using defaults)."""
     # This tests that the function signature allows calling without args
     # We don't actually call it to avoid running the ETL
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check if all parameters have defaults
     all_have_defaults = all(
@@ -125,7 +126,7 @@ def test_etl_function_callable_without_args():
 
 def test_etl_function_callable_with_args():
     """Test that load_all can be called with arguments."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check that we can call with force=True
     if 'force' in sig.parameters:
@@ -137,7 +138,7 @@ def test_etl_function_callable_with_args():
 
 def test_etl_function_parameter_types():
     """Test that load_all parameters have correct types."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check force parameter type
     force_param = sig.parameters['force']
@@ -153,7 +154,7 @@ def test_etl_function_parameter_types():
 
 def test_etl_function_kwargs():
     """Test that load_all accepts keyword arguments."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check that parameters can be passed as kwargs
     for param_name in sig.parameters:
@@ -161,7 +162,7 @@ def test_etl_function_kwargs():
 
 def test_etl_function_positional_args():
     """Test that load_all accepts positional arguments."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check that parameters can be passed positionally
     param_count = len(sig.parameters)
@@ -169,7 +170,7 @@ def test_etl_function_positional_args():
 
 def test_etl_function_required_params():
     """Test which parameters are required in load_all."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     required_params = [
         name for name, param in sig.parameters.items()
@@ -182,7 +183,7 @@ def test_etl_function_required_params():
 
 def test_etl_function_optional_params():
     """Test which parameters are optional in load_all."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     optional_params = [
         name for name, param in sig.parameters.items()
@@ -195,7 +196,7 @@ def test_etl_function_optional_params():
 
 def test_etl_function_parameter_order():
     """Test the order of parameters in load_all."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     param_names = list(sig.parameters.keys())
     
     # Check that parameters are in expected order
@@ -204,7 +205,7 @@ def test_etl_function_parameter_order():
 
 def test_etl_function_parameter_kind():
     """Test the kind of parameters in load_all."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     for param_name, param in sig.parameters.items():
         # All parameters should be positional/keyword
@@ -216,7 +217,7 @@ def test_etl_function_parameter_kind():
 
 def test_etl_function_no_varargs():
     """Test that load_all doesn't accept variable arguments."""
-    sig = inspect.signature(load_all)
+    sig = _LOAD_ALL_SIG
     
     # Check that no parameter is *args or **kwargs
     for param_name, param in sig.parameters.items():
@@ -245,85 +246,29 @@ def test_etl_function_qualname():
     """Test that load_all has proper qualified name."""
     assert load_all.__qualname__ == 'load_all'
 
-def test_etl_function_annotations_dict():
-    """Test that load_all has annotations dict."""
-    if hasattr(load_all, '__annotations__'):
-        annotations = load_all.__annotations__
-        assert isinstance(annotations, dict)
-
-def test_etl_function_defaults_tuple():
-    """Test that load_all has defaults tuple."""
-    if hasattr(load_all, '__defaults__'):
-        defaults = load_all.__defaults__
-        if defaults is not None:
-            assert isinstance(defaults, tuple)
-
-def test_etl_function_kwdefaults():
-    """Test that load_all has keyword defaults."""
-    if hasattr(load_all, '__kwdefaults__'):
-        kwdefaults = load_all.__kwdefaults__
-        if kwdefaults is not None:
-            assert isinstance(kwdefaults, dict)
-
-def test_etl_function_code_object():
-    """Test that load_all has a code object."""
-    assert hasattr(load_all, '__code__')
-    code = load_all.__code__
-    assert hasattr(code, 'co_name')
-    assert code.co_name == 'load_all'
-
-def test_etl_function_globals():
-    """Test that load_all has access to globals."""
-    assert hasattr(load_all, '__globals__')
-    globals_dict = load_all.__globals__
-    assert isinstance(globals_dict, dict)
-
-def test_etl_function_closure():
-    """Test that load_all closure information."""
-    if hasattr(load_all, '__closure__'):
-        closure = load_all.__closure__
-        if closure is not None:
-            assert isinstance(closure, tuple)
-
-def test_etl_function_cell_vars():
-    """Test that load_all cell variables."""
-    code = load_all.__code__
-    if hasattr(code, 'co_cellvars'):
-        cellvars = code.co_cellvars
-        assert isinstance(cellvars, tuple)
-
-def test_etl_function_free_vars():
-    """Test that load_all free variables."""
-    code = load_all.__code__
-    if hasattr(code, 'co_freevars'):
-        freevars = code.co_freevars
-        assert isinstance(freevars, tuple)
-
-def test_etl_function_arg_count():
-    """Test that load_all has correct argument count."""
-    code = load_all.__code__
-    assert code.co_argcount >= 0
-
-def test_etl_function_kwonly_arg_count():
-    """Test that load_all has correct keyword-only argument count."""
-    code = load_all.__code__
-    if hasattr(code, 'co_kwonlyargcount'):
-        assert code.co_kwonlyargcount >= 0
-
-def test_etl_function_nlocals():
-    """Test that load_all has correct local variable count."""
-    code = load_all.__code__
-    assert code.co_nlocals >= 0
-
-def test_etl_function_stack_size():
-    """Test that load_all has stack size information."""
-    code = load_all.__code__
-    assert code.co_stacksize >= 0
-
-def test_etl_function_flags():
-    """Test that load_all has code flags."""
-    code = load_all.__code__
-    assert hasattr(code, 'co_flags')
-    assert isinstance(code.co_flags, int)
+@pytest.mark.parametrize("attr,valid", [
+    ("__annotations__", lambda v: isinstance(v, dict)),
+    ("__defaults__", lambda v: v is None or isinstance(v, tuple)),
+    ("__kwdefaults__", lambda v: v is None or isinstance(v, dict)),
+    ("__globals__", lambda v: isinstance(v, dict)),
+    ("__closure__", lambda v: v is None or isinstance(v, tuple)),
+])
+def test_etl_function_attrs(attr, valid):
+    """Test load_all's function attributes."""
+    assert valid(getattr(load_all, attr))
+
+@pytest.mark.parametrize("attr,valid", [
+    ("co_name", lambda v: v == 'load_all'),
+    ("co_cellvars", lambda v: isinstance(v, tuple)),
+    ("co_freevars", lambda v: isinstance(v, tuple)),
+    ("co_argcount", lambda v: v >= 0),
+    ("co_kwonlyargcount", lambda v: v >= 0),
+    ("co_nlocals", lambda v: v >= 0),
+    ("co_stacksize", lambda v: v >= 0),
+    ("co_flags", lambda v: isinstance(v, int)),
+])
+def test_etl_function_code_attrs(attr, valid):
+    """Test load_all's code object attributes."""
+    assert valid(getattr(_LOAD_ALL_CODE, attr))
 
 # All tests in this file are designed to cover ETL function signatures, parameter validation, and module structure. No test is a forced pass; each one checks real aspects of the ETL interface. 
\ No newline at end of file
@@ -1,10 +1,11 @@
-import re, textwrap, pytest
+import json, re, textwrap, pytest
 from src import agent, prompts
 from src.agent import chat, create_chat_session, add_user_message, add_assistant_message
 
-pytestmark = pytest.mark.integration
+pytestmark = [pytest.mark.integration, pytest.mark.xdist_group("agent_client")]
 
 BUG_TEAM_SQL = "SELECT p.name FROM pokemon p JOIN pokemon_types t ON p.id = t.pokemon_id WHERE t.type_name='bug' AND p.is_default=1 ORDER BY p.base_experience DESC LIMIT 6"
+_BUG_TEAM_ARGS = json.dumps({"sql": BUG_TEAM_SQL})
 
 # Comprehensive integration test suite covering end-to-end agent functionality with real queries and tool interactions.
 # These tests validate the complete user experience from question to answer, ensuring the agent can handle complex Pokémon queries effectively.
@@ -16,7 +17,7 @@ def test_bug_team(scripted_llm):
             "tool_calls": [
                 {
                     "id": "call_1",
-                    "function": {"name": "run_query", "arguments": f'{{"sql": "{BUG_TEAM_SQL}"}}'}
+                    "function": {"name": "run_query", "arguments": _BUG_TEAM_ARGS}
                 }
             ]
         },
@@ -101,7 +102,7 @@ def test_multi_step_tool_use(scripted_llm):
 def test_llm_error_handling(monkeypatch):
     def fake_create(*_, **__):
         raise Exception("API Error")
-    monkeypatch.setattr("src.agent.client.chat.completions.create", fake_create)
+    monkeypatch.setattr("src.agent._CREATE", fake_create)
     out = agent.chat(
         [{"role": "system", "content": prompts.BASE_SYSTEM},
          {"role": "user", "content": "Trigger an LLM error."}]
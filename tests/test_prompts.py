@@ -1,3 +1,6 @@
+import re
+from collections.abc import Mapping, Sequence
+
 import pytest
 from src import prompts
 
@@ -16,139 +19,74 @@ def test_prompts_module_structure():
     # Just verify the module exists and can be imported
     assert hasattr(prompts, '__file__')
 
-def test_base_system_content():
-    """Test that BASE_SYSTEM contains expected content."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for key sections
-    assert "Pokédex-Pro" in base_system
-    assert "SQL access" in base_system
-    assert "run_query" in base_system
-    assert "run_python" in base_system
-    assert "DATABASE SCHEMA" in base_system
-    assert "WORKFLOW" in base_system
-    assert "COMPREHENSIVE CAPABILITIES" in base_system
-
-def test_base_system_database_schema():
-    """Test that BASE_SYSTEM contains database schema information."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for core tables
-    assert "pokemon_species" in base_system
-    assert "pokemon" in base_system
-    assert "pokemon_types" in base_system
-    assert "pokemon_stats" in base_system
-    assert "pokemon_abilities" in base_system
-    assert "pokemon_moves" in base_system
-    assert "move" in base_system
-    assert "ability" in base_system
-    assert "item" in base_system
-    assert "berry" in base_system
-    assert "evolution_chain" in base_system
-    assert "location" in base_system
-    assert "stat" in base_system
-    assert "nature" in base_system
-
-def test_base_system_relationships():
-    """Test that BASE_SYSTEM contains relationship information."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for relationship descriptions
-    assert "IMPORTANT RELATIONSHIPS" in base_system
-    assert "links to" in base_system
-    assert "pokemon.species_id" in base_system
-    assert "pokemon_types.pokemon_id" in base_system
-
-def test_base_system_workflow():
-    """Test that BASE_SYSTEM contains workflow instructions."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for workflow steps
-    assert "WORKFLOW" in base_system
-    assert "Analyze the user's question" in base_system
-    assert "Write appropriate SQL queries" in base_system
-    assert "Call run_query()" in base_system
-    assert "Use run_python()" in base_system
-    assert "Provide a clear, concise answer" in base_system
-
-def test_base_system_capabilities():
-    """Test that BASE_SYSTEM contains comprehensive capabilities."""
-    base_system = prompts.BASE_SYSTEM
-    # Comprehensive coverage of all major capabilities mentioned in the system prompt
-    present_capabilities = [
-        "Team building",
-        "Type effectiveness",
-        "Stat analysis",
-        "Evolution chains",
-        "Ability analysis",
-        "Legendary",
-        "Item analysis",
-        "Berry farming",
-        "Nature analysis",
-        "Machine/TM/HM",
-        "Multi-language",
-        "Regional variants",
-        "Encounter methods",
-        "Characteristic analysis",
-        "Move learning",
-        "Held item analysis",
-        "Form analysis"
-    ]
-    for capability in present_capabilities:
-        assert capability in base_system
-
-def test_base_system_sql_instructions():
-    """Test that BASE_SYSTEM contains SQL usage instructions."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for SQL-related instructions
-    assert "```sql```" in base_system
-    assert "transparency" in base_system
-    assert "SQL queries" in base_system
-
-def test_base_system_tool_instructions():
-    """Test that BASE_SYSTEM contains tool usage instructions."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Check for tool usage instructions
-    assert "run_query()" in base_system
-    assert "run_python()" in base_system
-    assert "function" in base_system
-
-def test_base_system_step_by_step():
-    """Test that BASE_SYSTEM mentions step-by-step thinking."""
-    base_system = prompts.BASE_SYSTEM
-    
-    assert "step-by-step" in base_system
-    assert "think" in base_system
-
-def test_base_system_explanations():
-    """Test that BASE_SYSTEM asks for explanations."""
-    base_system = prompts.BASE_SYSTEM
-    
-    assert "explanations" in base_system
-    assert "helpful" in base_system
-
-def test_base_system_comprehensive_database():
-    """Test that BASE_SYSTEM mentions comprehensive database."""
-    base_system = prompts.BASE_SYSTEM
-    
-    assert "comprehensive" in base_system
-    assert "PokéAPI" in base_system
-    assert "most comprehensive" in base_system
+@pytest.fixture(scope="session")
+def base_system():
+    """The system prompt, looked up once for the module."""
+    return prompts.BASE_SYSTEM
+
+@pytest.fixture(scope="session")
+def few_shot():
+    """The few-shot examples, looked up once for the module."""
+    return prompts.FEW_SHOT_EXAMPLES
+
+@pytest.fixture(scope="session")
+def fs_corpus(few_shot):
+    """All few-shot user questions, lower-cased and joined for substring checks."""
+    return "\n".join(ex["user"].lower() for ex in few_shot)
+
+# Phrases BASE_SYSTEM must contain, grouped by the part of the prompt they cover
+BASE_SYSTEM_NEEDLES = [
+    # Key sections
+    "Pokédex-Pro", "SQL access", "run_query", "run_python", "DATABASE SCHEMA",
+    "WORKFLOW", "COMPREHENSIVE CAPABILITIES",
+    # Core tables
+    "pokemon_species", "pokemon", "pokemon_types", "pokemon_stats", "pokemon_abilities",
+    "pokemon_moves", "move", "ability", "item", "berry", "evolution_chain", "location",
+    "stat", "nature",
+    # Relationships
+    "IMPORTANT RELATIONSHIPS", "links to", "pokemon.species_id", "pokemon_types.pokemon_id",
+    # Workflow steps
+    "Analyze the user's question", "Write appropriate SQL queries", "Call run_query()",
+    "Use run_python()", "Provide a clear, concise answer",
+    # Capabilities
+    "Team building", "Type effectiveness", "Stat analysis", "Evolution chains",
+    "Ability analysis", "Legendary", "Item analysis", "Berry farming", "Nature analysis",
+    "Machine/TM/HM", "Multi-language", "Regional variants", "Encounter methods",
+    "Characteristic analysis", "Move learning", "Held item analysis", "Form analysis",
+    # SQL and tool usage
+    "```sql```", "transparency", "SQL queries", "run_query()", "run_python()", "function",
+    "shape='columns'",
+    # Tone
+    "step-by-step", "think", "explanations", "helpful",
+    # Terminology and Unicode
+    "comprehensive", "PokéAPI", "most comprehensive", "SQL", "Python", "Pokédex", "Pokémon",
+]
+
+@pytest.fixture(scope="session")
+def base_matches(base_system):
+    """Every needle found in BASE_SYSTEM, from one overlapping scan of the prompt."""
+    # Longest-first lookahead alternation: at each offset it reports the longest needle
+    # starting there, and any needle inside a reported one must occur there too.
+    needles = sorted(set(BASE_SYSTEM_NEEDLES), key=len, reverse=True)
+    scan = re.compile("(?=(" + "|".join(map(re.escape, needles)) + "))")
+    matched = set(scan.findall(base_system))
+    return {n for n in needles if any(n in m for m in matched)}
+
+def test_base_system_contains(base_matches):
+    """Test that BASE_SYSTEM contains every expected phrase, reporting all missing ones at once."""
+    missing = sorted(set(BASE_SYSTEM_NEEDLES) - base_matches)
+    assert not missing, f"BASE_SYSTEM lacks: {missing}"
 
 def test_few_shot_examples_exist():
     """Test that FEW_SHOT_EXAMPLES constant exists."""
     assert hasattr(prompts, 'FEW_SHOT_EXAMPLES')
-    assert isinstance(prompts.FEW_SHOT_EXAMPLES, list)
+    assert isinstance(prompts.FEW_SHOT_EXAMPLES, Sequence)
     assert len(prompts.FEW_SHOT_EXAMPLES) > 0
 
-def test_few_shot_examples_structure():
+def test_few_shot_examples_structure(few_shot):
     """Test that FEW_SHOT_EXAMPLES has correct structure."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
-    for example in examples:
-        assert isinstance(example, dict)
+    for example in few_shot:
+        assert isinstance(example, Mapping)
         assert "user" in example
         assert "assistant" in example
         assert isinstance(example["user"], str)
@@ -156,132 +94,66 @@ def test_few_shot_examples_structure():
         assert len(example["user"]) > 0
         assert len(example["assistant"]) > 0
 
-def test_few_shot_examples_content():
+def test_few_shot_examples_content(fs_corpus):
     """Test that FEW_SHOT_EXAMPLES contain relevant content."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
-    # Check that examples cover different types of queries
-    user_questions = [ex["user"] for ex in examples]
-    
-    # Should have team building example
-    team_questions = [q for q in user_questions if "team" in q.lower()]
-    assert len(team_questions) > 0
-    
-    # Should have stat analysis example
-    stat_questions = [q for q in user_questions if "stat" in q.lower()]
-    assert len(stat_questions) > 0
-    
-    # Should have type effectiveness example
-    type_questions = [q for q in user_questions if "type" in q.lower()]
-    assert len(type_questions) > 0
-    
-    # Should have move learning example
-    move_questions = [q for q in user_questions if "move" in q.lower()]
-    assert len(move_questions) > 0
+    # Team building, stat analysis, type effectiveness and move learning examples
+    assert "team" in fs_corpus
+    assert "stat" in fs_corpus
+    assert "type" in fs_corpus
+    assert "move" in fs_corpus
 
-def test_few_shot_examples_sql_usage():
+def test_few_shot_examples_sql_usage(few_shot):
     """Test that FEW_SHOT_EXAMPLES show SQL usage."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
     # Check that examples show SQL queries
-    sql_examples = [ex for ex in examples if "```sql" in ex["assistant"]]
+    sql_examples = [ex for ex in few_shot if "```sql" in ex["assistant"]]
     assert len(sql_examples) > 0
 
-def test_few_shot_examples_explanation():
+def test_few_shot_examples_explanation(few_shot):
     """Test that FEW_SHOT_EXAMPLES include explanations."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
     # Check that examples include explanations
-    explained_examples = [ex for ex in examples if "useful" in ex["assistant"].lower() or "helpful" in ex["assistant"].lower()]
+    explained_examples = [ex for ex in few_shot if "useful" in ex["assistant"].lower() or "helpful" in ex["assistant"].lower()]
     assert len(explained_examples) > 0
 
-def test_few_shot_examples_variety():
+def test_few_shot_examples_variety(few_shot, fs_corpus):
     """Test that FEW_SHOT_EXAMPLES cover a variety of scenarios."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
     # Should have multiple examples
-    assert len(examples) >= 5
-    
-    # Check for different types of queries
-    user_questions = [ex["user"].lower() for ex in examples]
-    
-    # Team building
-    assert any("team" in q for q in user_questions)
-    
-    # Stats
-    assert any("stat" in q for q in user_questions)
-    
-    # Types
-    assert any("type" in q for q in user_questions)
-    
-    # Moves
-    assert any("move" in q for q in user_questions)
-    
-    # Items
-    assert any("item" in q for q in user_questions)
-    
-    # Natures
-    assert any("nature" in q for q in user_questions)
-    
-    # Forms
-    assert any("mega" in q for q in user_questions)
+    assert len(few_shot) >= 5
     
-    # Costs
-    assert any("expensive" in q for q in user_questions)
-    
-    # Learning
-    assert any("learn" in q for q in user_questions)
+    # Team building, stats, types, moves, items, natures, forms, costs, learning
+    for topic in ["team", "stat", "type", "move", "item", "nature", "mega", "expensive", "learn"]:
+        assert topic in fs_corpus, f"no few-shot question about {topic!r}"
 
-def test_base_system_length():
+def test_base_system_length(base_system):
     """Test that BASE_SYSTEM has sufficient length for comprehensive instructions."""
-    base_system = prompts.BASE_SYSTEM
-    
     # Should be substantial in length
     assert len(base_system) > 1000
 
-def test_base_system_formatting():
+def test_base_system_formatting(base_system):
     """Test that BASE_SYSTEM has proper formatting."""
-    base_system = prompts.BASE_SYSTEM
-    
     # Should have proper line breaks
     assert "\n" in base_system
     
     # Should have proper sections
     assert ":" in base_system
 
-def test_base_system_no_placeholders():
+def test_base_system_no_placeholders(base_system):
     """Test that BASE_SYSTEM doesn't contain placeholder text."""
-    base_system = prompts.BASE_SYSTEM
-    
     # Should not contain placeholder indicators
     assert "TODO" not in base_system
     assert "FIXME" not in base_system
     assert "XXX" not in base_system
     assert "PLACEHOLDER" not in base_system
 
-def test_base_system_consistent_terminology():
-    """Test that BASE_SYSTEM uses consistent terminology."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Should use consistent terms
-    assert "Pokédex-Pro" in base_system
-    assert "PokéAPI" in base_system
-    assert "SQL" in base_system
-    assert "Python" in base_system
-
-def test_base_system_clear_instructions():
+def test_base_system_clear_instructions(base_system):
     """Test that BASE_SYSTEM provides clear instructions."""
-    base_system = prompts.BASE_SYSTEM
-    
     # Should have clear action words
     assert "Execute" in base_system or "execute" in base_system
     assert "Analyze" in base_system or "analyze" in base_system
     assert "Provide" in base_system or "provide" in base_system
 
-def test_few_shot_examples_realistic():
+def test_few_shot_examples_realistic(few_shot):
     """Test that FEW_SHOT_EXAMPLES contain realistic queries."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    for example in examples:
+    for example in few_shot:
         user_question = example["user"]
         assistant_response = example["assistant"]
         # User questions should be realistic
@@ -295,20 +167,18 @@ def test_prompts_module_docstring():
     assert prompts.__doc__ is not None
     assert len(prompts.__doc__) > 0
 
-def test_base_system_docstring():
+def test_base_system_docstring(base_system):
     """Test that BASE_SYSTEM has proper documentation."""
     # Check that it's properly defined as a string
-    assert isinstance(prompts.BASE_SYSTEM, str)
+    assert isinstance(base_system, str)
     
     # Check that it starts with a description
-    assert prompts.BASE_SYSTEM.strip().startswith("You are")
+    assert base_system.strip().startswith("You are")
 
-def test_few_shot_examples_documentation():
+def test_few_shot_examples_documentation(few_shot):
     """Test that FEW_SHOT_EXAMPLES are properly documented."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
     # Check that examples are well-structured
-    for i, example in enumerate(examples):
+    for i, example in enumerate(few_shot):
         assert "user" in example, f"Example {i} missing 'user' key"
         assert "assistant" in example, f"Example {i} missing 'assistant' key"
         assert example["user"], f"Example {i} has empty user question"
@@ -322,23 +192,48 @@ def test_prompts_module_imports():
     assert hasattr(prompts, '__file__')
     assert hasattr(prompts, '__name__')
 
-def test_base_system_unicode_support():
-    """Test that BASE_SYSTEM supports Unicode characters."""
-    base_system = prompts.BASE_SYSTEM
-    
-    # Should handle special characters properly
-    assert "Pokédex" in base_system
-    assert "Pokémon" in base_system
-
-def test_few_shot_examples_unicode_support():
+def test_few_shot_examples_unicode_support(few_shot):
     """Test that FEW_SHOT_EXAMPLES support Unicode characters."""
-    examples = prompts.FEW_SHOT_EXAMPLES
-    
-    for example in examples:
+    for example in few_shot:
         # Should handle special characters in questions and responses
         user_question = example["user"]
         assistant_response = example["assistant"]
         
         # Check that strings are properly encoded
         assert isinstance(user_question, str)
-        assert isinstance(assistant_response, str) 
\ No newline at end of file
+        assert isinstance(assistant_response, str)
+
+def test_base_system_is_compact(base_system):
+    """Test that BASE_SYSTEM carries no redundant whitespace."""
+    assert "\n\n" not in base_system
+    assert " \n" not in base_system
+    assert base_system == base_system.strip()
+    assert base_system.count("- pokemon_form:") == 1
+
+def test_compact_preserves_content():
+    """Test that whitespace compaction keeps every line of the verbose prompt."""
+    verbose = "HEADER:   \n\n\n- a: id, name\t\n\n- b: id\n\nFooter text."
+    compact = prompts._compact(verbose)
+    
+    assert compact == "HEADER:\n- a: id, name\n- b: id\nFooter text."
+    assert [line.strip() for line in verbose.splitlines() if line.strip()] == compact.splitlines()
+    assert prompts._compact(compact) == compact
+
+def test_base_system_static_has_no_template_holes(base_system):
+    """Test that the cacheable prefix is a plain literal, not a half-filled template."""
+    assert prompts.BASE_SYSTEM_STATIC is base_system
+    assert re.search(r"\{\w*\}", base_system) is None
+
+def test_build_system_appends_after_static_prefix():
+    """Test that dynamic context never displaces the static prefix."""
+    assert prompts.build_system() == prompts.BASE_SYSTEM_STATIC
+    assert prompts.build_system("") == prompts.BASE_SYSTEM_STATIC
+    system = prompts.build_system("User prefers   \n\nGen 1 only.")
+    assert system.startswith(prompts.BASE_SYSTEM_STATIC + "\n")
+    assert system.endswith("User prefers\nGen 1 only.")
+
+def test_few_shot_examples_are_read_only(few_shot):
+    """Test that the shared examples can't be modified in place."""
+    assert isinstance(few_shot, tuple)
+    with pytest.raises(TypeError):
+        few_shot[0]["user"] = "changed"
@@ -5,14 +5,6 @@ import json
 # Comprehensive test suite covering all tool functionality including Python sandbox security, query execution, data processing, and error handling.
 # These tests ensure the tools provide safe, powerful data analysis capabilities while maintaining security boundaries and proper error recovery.
 
-def test_sandbox_allows_basic_ops():
-    out = run_python_tool("result = len([1,2,3])")
-    assert '"result": 3' in out
-
-def test_sandbox_blocks_open():
-    with pytest.raises(SecurityError):
-        run_python_tool("open('x','w')")  # noqa: SCS110
-
 def test_run_query_tool_success():
     """Test successful query execution."""
     result = run_query_tool("SELECT id, name FROM pokemon_species LIMIT 1")
@@ -27,243 +19,99 @@ def test_run_query_tool_error():
     assert len(result) == 1
     assert "error" in result[0]
 
-def test_sandbox_blocks_file_operations():
-    """Test that file operations are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("file('x','w')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("open('x','r')")
-
-def test_sandbox_blocks_import_operations():
-    """Test that import operations are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("__import__('os')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("import os")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("from os import path")
-
-def test_sandbox_blocks_eval_exec():
-    """Test that eval and exec are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("eval('1+1')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("exec('x=1')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("compile('x=1', '<string>', 'exec')")
-
-def test_sandbox_blocks_system_operations():
-    """Test that system operations are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("os.system('ls')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("subprocess.call(['ls'])")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("sys.exit()")
-
-def test_sandbox_blocks_attribute_operations():
-    """Test that attribute operations are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("getattr(object, 'name')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("setattr(object, 'name', 'value')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("delattr(object, 'name')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("hasattr(object, 'name')")
-
-def test_sandbox_blocks_globals_locals():
-    """Test that globals and locals are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("globals()")
-    
+BLOCKED_SNIPPETS = [
+    "open('x','w')",  # noqa: SCS110
+    "open('x','r')",
+    "file('x','w')",
+    "__import__('os')",
+    "import os",
+    "from os import path",
+    "eval('1+1')",
+    "exec('x=1')",
+    "compile('x=1', '<string>', 'exec')",
+    "os.system('ls')",
+    "subprocess.call(['ls'])",
+    "sys.exit()",
+    "getattr(object, 'name')",
+    "setattr(object, 'name', 'value')",
+    "delattr(object, 'name')",
+    "hasattr(object, 'name')",
+    "globals()",
+    "locals()",
+    "vars()",
+    "input('> ')",
+    # Detection is case-insensitive
+    "OPEN('x','w')",
+    "Import os",
+    "From os import path",
+    "import subprocess",
+    "import sys",
+    *[f"import {module}" for module in ['pickle', 'marshal', 'ctypes', 'socket', 'urllib', 'requests']],
+    "from _ import *",
+    # Blocked modules reached through the preloaded ones
+    "statistics.sys.modules['os'].getcwd()",
+    "statistics.random._os.getpid()",
+    "collections._sys.platform",
+    "json.codecs.open('/etc/hostname').read()",
+    # Frames lead back to the host's globals
+    "g = (g.gi_frame.f_back.f_globals for _ in [1]); x = list(g)",
+]
+
+@pytest.mark.parametrize("snippet", BLOCKED_SNIPPETS)
+def test_sandbox_blocks(snippet):
+    """Test that dangerous operations raise SecurityError before running."""
     with pytest.raises(SecurityError):
-        run_python_tool("locals()")
-
-def test_sandbox_allows_safe_operations():
-    """Test that safe operations are allowed."""
-    result = run_python_tool("x = [1, 2, 3]; y = len(x)")
-    assert '"x": [1, 2, 3]' in result
-    assert '"y": 3' in result
+        run_python_tool(snippet)
+
+ALLOWED_SNIPPETS = [
+    ("result = len([1,2,3])", {"result": 3}),
+    ("x = [1, 2, 3]; y = len(x)", {"x": [1, 2, 3], "y": 3}),
+    ("result = 2 + 2", {"result": 4}),
+    ("result = 2 ** 3", {"result": 8}),
+    ("data = [1, 2, 3, 4, 5]; result = sum(data) / len(data)", {"result": 3.0}),
+    ("data = [1, 1, 2, 3]; result = len(set(data))", {"result": 3}),
+    ("data = [1, 2, 3]; result = [x * 2 for x in data]", {"result": [2, 4, 6]}),
+    ("data = {'test': 123}; result = str(data)", {"result": "{'test': 123}"}),
+    ("data = {'a': 1, 'b': 2}; result = {k: v * 2 for k, v in data.items()}", {"result": {"a": 2, "b": 4}}),
+    ("data = {1, 2, 3}; result = {x * 2 for x in data}", {"result": {2, 4, 6}}),
+    ("data = (1, 2, 3); result = tuple(x * 2 for x in data)", {"result": (2, 4, 6)}),
+    ("text = 'hello'; result = text.upper()", {"result": "HELLO"}),
+    ("a = 10; b = 5; result = a + b", {"result": 15}),
+    ("a = True; b = False; result = a and b", {"result": False}),
+    ("result = str(123) + 'test'", {"result": "123test"}),
+    ("result = list(range(5))", {"result": [0, 1, 2, 3, 4]}),
+    ("result = list(enumerate(['a', 'b', 'c']))", {"result": [(0, "a"), (1, "b"), (2, "c")]}),
+    ("result = list(zip([1, 2, 3], ['a', 'b', 'c']))", {"result": [(1, "a"), (2, "b"), (3, "c")]}),
+    ("result = list(filter(lambda x: x > 2, [1, 2, 3, 4, 5]))", {"result": [3, 4, 5]}),
+    ("result = list(map(lambda x: x * 2, [1, 2, 3]))", {"result": [2, 4, 6]}),
+    ("result = any([False, True, False])", {"result": True}),
+    ("result = all([True, True, True])", {"result": True}),
+    ("result = list(reversed([1, 2, 3]))", {"result": [3, 2, 1]}),
+]
+
+@pytest.mark.parametrize("code,expected", ALLOWED_SNIPPETS)
+def test_sandbox_allows(code, expected):
+    """Test that safe data-processing code runs and reports its variables."""
+    result = run_python_tool(code)
+    assert {name: result.get(name) for name in expected} == expected
 
 def test_sandbox_with_custom_globals():
     """Test sandbox with custom globals."""
     custom_globals = {"custom_var": 42}
     result = run_python_tool("result = custom_var * 2", custom_globals)
-    assert '"result": 84' in result
+    assert result["result"] == 84
 
 def test_sandbox_handles_exceptions():
     """Test that exceptions in code are handled gracefully."""
     result = run_python_tool("x = 1 / 0")
     assert "error" in result
 
-def test_sandbox_case_insensitive_detection():
-    """Test that dangerous patterns are detected case-insensitively."""
-    with pytest.raises(SecurityError):
-        run_python_tool("OPEN('x','w')")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("Import os")
-    
-    with pytest.raises(SecurityError):
-        run_python_tool("From os import path")
-
-def test_sandbox_allows_math_operations():
-    """Test that math operations are allowed."""
-    # Test basic math without imports
-    result = run_python_tool("result = 2 + 2")
-    assert '"result": 4' in result
-    
-    # Test power operations
-    result = run_python_tool("result = 2 ** 3")
-    assert '"result": 8' in result
-
-def test_sandbox_allows_statistics():
-    """Test that statistics operations are allowed."""
-    # Test basic statistics without imports
-    result = run_python_tool("data = [1, 2, 3, 4, 5]; result = sum(data) / len(data)")
-    assert '"result": 3.0' in result
-
-def test_sandbox_allows_collections():
-    """Test that collections operations are allowed."""
-    # Test basic list operations
-    result = run_python_tool("data = [1, 1, 2, 3]; result = len(set(data))")
-    assert '"result": 3' in result
-
-def test_sandbox_allows_itertools():
-    """Test that itertools operations are allowed."""
-    # Test basic iteration without imports
-    result = run_python_tool("data = [1, 2, 3]; result = [x * 2 for x in data]")
-    assert '"result": [2, 4, 6]' in result
-
-def test_sandbox_allows_json():
-    """Test that JSON operations are allowed."""
-    # Test basic dict operations (JSON-like)
-    result = run_python_tool("data = {'test': 123}; result = str(data)")
-    assert '"result"' in result
-
-def test_sandbox_blocks_os_import():
-    """Test that os module import is blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("import os")
-
-def test_sandbox_blocks_subprocess_import():
-    """Test that subprocess module import is blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("import subprocess")
-
-def test_sandbox_blocks_sys_import():
-    """Test that sys module import is blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("import sys")
-
-def test_sandbox_blocks_other_dangerous_imports():
-    """Test that other dangerous imports are blocked."""
-    dangerous_modules = ['pickle', 'marshal', 'ctypes', 'socket', 'urllib', 'requests']
-    for module in dangerous_modules:
-        with pytest.raises(SecurityError):
-            run_python_tool(f"import {module}")
-
-def test_sandbox_allows_list_operations():
-    """Test that list operations are allowed."""
-    result = run_python_tool("data = [1, 2, 3]; result = [x * 2 for x in data]")
-    assert '"result": [2, 4, 6]' in result
-
-def test_sandbox_allows_dict_operations():
-    """Test that dictionary operations are allowed."""
-    result = run_python_tool("data = {'a': 1, 'b': 2}; result = {k: v * 2 for k, v in data.items()}")
-    assert '"result": {"a": 2, "b": 4}' in result
-
-def test_sandbox_allows_set_operations():
-    """Test that set operations are allowed."""
-    result = run_python_tool("data = {1, 2, 3}; result = {x * 2 for x in data}")
-    assert '"result"' in result
-
-def test_sandbox_allows_tuple_operations():
-    """Test that tuple operations are allowed."""
-    result = run_python_tool("data = (1, 2, 3); result = tuple(x * 2 for x in data)")
-    # Accept list result
-    assert '"result": [2, 4, 6]' in result
-
-def test_sandbox_allows_string_operations():
-    """Test that string operations are allowed."""
-    result = run_python_tool("text = 'hello'; result = text.upper()")
-    assert '"result": "HELLO"' in result
-
-def test_sandbox_allows_numeric_operations():
-    """Test that numeric operations are allowed."""
-    result = run_python_tool("a = 10; b = 5; result = a + b")
-    assert '"result": 15' in result
-
-def test_sandbox_allows_boolean_operations():
-    """Test that boolean operations are allowed."""
-    result = run_python_tool("a = True; b = False; result = a and b")
-    assert '"result": false' in result
-
-def test_sandbox_allows_type_conversions():
-    """Test that type conversions are allowed."""
-    result = run_python_tool("result = str(123) + 'test'")
-    assert '"result": "123test"' in result
-
-def test_sandbox_allows_range_operations():
-    """Test that range operations are allowed."""
-    result = run_python_tool("result = list(range(5))")
-    assert '"result": [0, 1, 2, 3, 4]' in result
-
-def test_sandbox_allows_enumerate_operations():
-    """Test that enumerate operations are allowed."""
-    result = run_python_tool("result = list(enumerate(['a', 'b', 'c']))")
-    assert '"result"' in result
-
-def test_sandbox_allows_zip_operations():
-    """Test that zip operations are allowed."""
-    result = run_python_tool("result = list(zip([1, 2, 3], ['a', 'b', 'c']))")
-    assert '"result"' in result
-
-def test_sandbox_allows_filter_operations():
-    """Test that filter operations are allowed."""
-    result = run_python_tool("result = list(filter(lambda x: x > 2, [1, 2, 3, 4, 5]))")
-    assert '"result": [3, 4, 5]' in result
-
-def test_sandbox_allows_map_operations():
-    """Test that map operations are allowed."""
-    result = run_python_tool("result = list(map(lambda x: x * 2, [1, 2, 3]))")
-    assert '"result": [2, 4, 6]' in result
-
-def test_sandbox_allows_any_all_operations():
-    """Test that any/all operations are allowed."""
-    result = run_python_tool("result = any([False, True, False])")
-    assert '"result": true' in result
-    
-    result = run_python_tool("result = all([True, True, True])")
-    assert '"result": true' in result
-
-def test_sandbox_allows_reversed_operations():
-    """Test that reversed operations are allowed."""
-    result = run_python_tool("result = list(reversed([1, 2, 3]))")
-    assert '"result": [3, 2, 1]' in result
-
-def test_sandbox_blocks_underscore_imports():
-    """Test that underscore imports are blocked."""
-    with pytest.raises(SecurityError):
-        run_python_tool("from _ import *")
-
 def test_sandbox_blocks_builtins_manipulation():
     """Test that builtins manipulation is blocked."""
     # This test checks that the sandbox doesn't allow dangerous builtins access
     # Since the current sandbox doesn't block this, we'll test that it at least doesn't crash
     result = run_python_tool("result = 'builtins test'")
-    assert '"result": "builtins test"' in result
+    assert result["result"] == "builtins test"
 
 def test_sandbox_handles_complex_calculations():
     """Test that complex calculations work."""
@@ -274,7 +122,7 @@ def test_sandbox_handles_complex_calculations():
         std_dev = variance ** 0.5
         result = {'mean': mean, 'std_dev': std_dev}
     """)
-    assert '"result"' in result
+    assert "result" in result
 
 def test_sandbox_handles_data_analysis():
     """Test that data analysis operations work."""
@@ -289,22 +137,34 @@ def test_sandbox_handles_data_analysis():
             'count': len(data)
         }
     """)
-    assert '"result"' in result
+    assert "result" in result
 
 def test_sandbox_handles_empty_code():
     """Test that empty code is handled."""
     result = run_python_tool("")
-    assert result == "{}"
+    assert result == {}
+
+def test_sandbox_json_empty_result():
+    """Test that code defining no public variables serialises to an empty object."""
+    from src.tools import run_python_tool_json
+    assert run_python_tool_json("") == "{}"
+    assert run_python_tool_json("_hidden = 1") == "{}"
+
+def test_sandbox_json_unserialisable_result():
+    """Test that values JSON can't hold come back as an error instead of raising."""
+    from src.tools import run_python_tool_json
+    assert run_python_tool("d = {(1, 2): 3}") == {"d": {(1, 2): 3}}
+    assert "error" in json.loads(run_python_tool_json("d = {(1, 2): 3}"))
 
 def test_sandbox_handles_whitespace_only():
     """Test that whitespace-only code is handled."""
     result = run_python_tool("   \n\t  ")
-    assert result == "{}"
+    assert result == {}
 
 def test_sandbox_handles_comments():
     """Test that comments are handled."""
     result = run_python_tool("# This is a comment\nresult = 42")
-    assert '"result": 42' in result
+    assert result["result"] == 42
 
 def test_sandbox_handles_multiline_code():
     """Test that multiline code is handled."""
@@ -313,7 +173,7 @@ def test_sandbox_handles_multiline_code():
         y = 2
         result = x + y
     """)
-    assert '"result": 3' in result
+    assert result["result"] == 3
 
 def test_sandbox_handles_nested_structures():
     """Test that nested data structures work."""
@@ -325,7 +185,7 @@ def test_sandbox_handles_nested_structures():
         }
         result = data
     """)
-    assert '"result"' in result
+    assert "result" in result
 
 def test_sandbox_handles_lambda_functions():
     """Test that lambda functions work."""
@@ -333,7 +193,7 @@ def test_sandbox_handles_lambda_functions():
         func = lambda x: x * 2
         result = func(5)
     """)
-    assert '"result": 10' in result
+    assert result["result"] == 10
 
 def test_sandbox_handles_list_comprehensions():
     """Test that list comprehensions work."""
@@ -341,7 +201,7 @@ def test_sandbox_handles_list_comprehensions():
         numbers = [1, 2, 3, 4, 5]
         result = [x * 2 for x in numbers if x % 2 == 0]
     """)
-    assert '"result": [4, 8]' in result
+    assert result["result"] == [4, 8]
 
 def test_sandbox_handles_dict_comprehensions():
     """Test that dict comprehensions work."""
@@ -349,7 +209,7 @@ def test_sandbox_handles_dict_comprehensions():
         numbers = [1, 2, 3]
         result = {x: x * 2 for x in numbers}
     """)
-    assert '"result": {"1": 2, "2": 4, "3": 6}' in result
+    assert result["result"] == {1: 2, 2: 4, 3: 6}
 
 def test_sandbox_handles_set_comprehensions():
     """Test that set comprehensions work."""
@@ -357,7 +217,7 @@ def test_sandbox_handles_set_comprehensions():
         numbers = [1, 2, 2, 3, 3, 3]
         result = {x * 2 for x in numbers}
     """)
-    assert '"result"' in result
+    assert "result" in result
 
 def test_sandbox_handles_generator_expressions():
     """Test that generator expressions work."""
@@ -366,7 +226,7 @@ def test_sandbox_handles_generator_expressions():
         gen = (x * 2 for x in numbers)
         result = list(gen)
     """)
-    assert '"result": [2, 4, 6, 8, 10]' in result
+    assert result["result"] == [2, 4, 6, 8, 10]
 
 def test_sandbox_handles_conditional_expressions():
     """Test that conditional expressions work."""
@@ -374,7 +234,7 @@ def test_sandbox_handles_conditional_expressions():
         x = 5
         result = 'even' if x % 2 == 0 else 'odd'
     """)
-    assert '"result": "odd"' in result
+    assert result["result"] == "odd"
 
 def test_sandbox_handles_multiple_variables():
     """Test that multiple variables are returned."""
@@ -383,9 +243,7 @@ def test_sandbox_handles_multiple_variables():
         y = 2
         z = 3
     """)
-    assert '"x": 1' in result
-    assert '"y": 2' in result
-    assert '"z": 3' in result
+    assert result == {"x": 1, "y": 2, "z": 3}
 
 def test_sandbox_filters_private_variables():
     """Test that private variables are filtered out."""
@@ -395,10 +253,7 @@ def test_sandbox_filters_private_variables():
         __very_private = 3
         public = 4
     """)
-    assert '"x": 1' in result
-    assert '"public": 4' in result
-    assert '"_private"' not in result
-    assert '"__very_private"' not in result
+    assert result == {"x": 1, "public": 4}
 
 def test_sandbox_filters_module_variables():
     """Test that module variables are filtered out."""
@@ -407,9 +262,7 @@ def test_sandbox_filters_module_variables():
         json = "test"
         math = "test"
     """)
-    assert '"x": 1' in result
-    assert '"json"' not in result
-    assert '"math"' not in result
+    assert result == {"x": 1}
 
 def test_run_query_tool_with_empty_sql():
     """Test query tool with empty SQL."""
@@ -429,4 +282,108 @@ def test_security_error_class():
     """Test that SecurityError is properly defined."""
     error = SecurityError("test error")
     assert str(error) == "test error"
-    assert isinstance(error, Exception) 
\ No newline at end of file
+    assert isinstance(error, Exception)
+
+def test_sandbox_prunes_long_lists():
+    """Test that long sequences are cut down for the LLM but not for Python callers."""
+    from src.tools import run_python_tool_json
+    assert run_python_tool("result = list(range(1000))")["result"] == list(range(1000))
+    result = json.loads(run_python_tool_json("result = list(range(1000))"))
+    assert result["result"][:3] == [0, 1, 2]
+    assert len(result["result"]) == 51
+    assert "1000 total" in result["result"][-1]
+
+def test_sandbox_caps_output_size():
+    """Test that oversized output is truncated with a marker."""
+    from src.tools import MAX_RESULT_CHARS, run_python_tool_json
+    for code in ("result = 'x' * 100000", "result = '\"' * 100000", "result = '\\\\' * 100000"):
+        result = run_python_tool_json(code)
+        assert len(result) <= MAX_RESULT_CHARS
+        assert json.loads(result)["_truncated"] is True
+        # Escaping can at most double the cut text, so at least ~half the budget survives
+        assert len(json.loads(result)["output"]) > MAX_RESULT_CHARS // 3
+
+def test_sandbox_handles_big_integers():
+    """Test that integers wider than 64 bits still serialise."""
+    from src.tools import run_python_tool_json
+    result = run_python_tool_json("result = 2 ** 100")
+    assert json.loads(result)["result"] == 2 ** 100
+
+def test_run_query_tool_json(mini_db, monkeypatch):
+    """Test that the agent-facing query tool returns JSON text for rows and errors."""
+    import functools
+    from src import db, tools
+    monkeypatch.setattr(tools, "run_query_json", functools.partial(db.run_query_json, db_path=mini_db))
+    
+    rows = json.loads(tools.run_query_tool_json("SELECT id, name FROM pokemon_species LIMIT 1"))
+    assert rows == [{"id": 1, "name": "bulbasaur"}]
+    assert "no such table" in json.loads(tools.run_query_tool_json("SELECT * FROM nonexistent_table"))[0]["error"]
+
+def test_run_query_tool_batch(mini_db, monkeypatch):
+    """Test that a list of SQL statements runs as one batch in both query tools."""
+    import functools
+    from src import db, tools
+    monkeypatch.setattr(tools, "run_queries", functools.partial(db.run_queries, db_path=mini_db))
+    
+    sqls = ["SELECT id FROM pokemon", "SELECT name FROM pokemon_species"]
+    assert tools.run_query_tool(sqls) == [[{"id": 1}], [{"name": "bulbasaur"}]]
+    assert json.loads(tools.run_query_tool_json(sqls)) == [[{"id": 1}], [{"name": "bulbasaur"}]]
+    error = tools.run_query_tool(["SELECT 1", "SELECT * FROM nonexistent_table"])
+    assert "statement 2" in error[0]["error"]
+
+def test_run_query_tool_shapes(mini_db, monkeypatch):
+    """Test that shape='columns' returns one list per column and unknown shapes are errors."""
+    import functools
+    from src import db, tools
+    monkeypatch.setattr(tools, "run_query", functools.partial(db.run_query, db_path=mini_db))
+    monkeypatch.setattr(tools, "run_query_columns", functools.partial(db.run_query_columns, db_path=mini_db))
+    
+    sql = "SELECT id, name FROM pokemon_species LIMIT 1"
+    assert tools.run_query_tool(sql) == [{"id": 1, "name": "bulbasaur"}]
+    assert tools.run_query_tool(sql, shape="columns") == {"id": [1], "name": ["bulbasaur"]}
+    assert json.loads(tools.run_query_tool_json(sql, shape="columns")) == {"id": [1], "name": ["bulbasaur"]}
+    assert "Unknown shape" in tools.run_query_tool(sql, shape="table")[0]["error"]
+
+def test_sandbox_allows_harmless_lookalikes():
+    """Test that identifiers and strings merely containing blocked words are allowed."""
+    result = run_python_tool("""
+        def reopen(x): return x
+        photos = []
+        photos.append(reopen(1))
+        note = "data from the import table"
+    """)
+    assert result["photos"] == [1]
+    assert result["note"] == "data from the import table"
+
+def test_sandbox_blocks_dunder_access():
+    """Test that dunder attribute and name access is refused."""
+    with pytest.raises(SecurityError):
+        run_python_tool("x = ().__class__.__base__.__subclasses__()")
+    with pytest.raises(SecurityError):
+        run_python_tool("b = __builtins__")
+
+def test_sandbox_reports_syntax_errors():
+    """Test that unparseable code without blocked patterns returns an error instead of raising."""
+    result = run_python_tool("x = (")
+    assert "error" in result
+
+def test_sandbox_reuses_compiled_code():
+    """Test that repeated snippets are compiled once but still run in fresh globals."""
+    from src import tools
+    
+    code = "counter = seed + 1"
+    assert run_python_tool(code, {"seed": 1})["counter"] == 2
+    hits = tools._compile.cache_info().hits
+    assert run_python_tool(code, {"seed": 5})["counter"] == 6
+    assert tools._compile.cache_info().hits == hits + 1
+
+def test_sandbox_top_level_names_visible_in_nested_scopes():
+    """Test that comprehensions and functions see top-level variables, and modules stay hidden."""
+    result = run_python_tool("""
+        k = 3
+        def triple(x): return x * k
+        result = [triple(x) for x in range(3)]
+        m = math
+    """)
+    assert result["result"] == [0, 3, 6]
+    assert "m" not in result